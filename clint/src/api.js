@@ -43,20 +43,52 @@ export const loginUser = async ({ username, password }) => {
 
 /* ---------------- CHAT ---------------- */
 
+// Idempotency key for one composed message
+// (crypto.randomUUID only exists in secure contexts; getRandomValues works over plain http too)
+export const newIdempotencyKey = () => {
+  if (globalThis.crypto?.randomUUID) return crypto.randomUUID();
+  const bytes = globalThis.crypto?.getRandomValues
+    ? crypto.getRandomValues(new Uint8Array(16))
+    : Uint8Array.from({ length: 16 }, () => Math.floor(Math.random() * 256));
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+};
+
 // Send Chat
-export const sendChat = (messages) =>
-  handleRequest(api.post("/api/chat", messages));
+// Pass the same idempotencyKey when retrying a message so the server answers it only once
+export const sendChat = (messages, idempotencyKey = newIdempotencyKey()) =>
+  handleRequest(
+    api.post("/api/chat", messages, { headers: { "Idempotency-Key": idempotencyKey } })
+  );
 
-// Save + Summarize conversation
+// Save + Summarize conversation (queues a background job)
 export const saveConversation = (payload) =>
   handleRequest(api.post("/save-conversation", payload));
 
-// Fetch messages of specific chat
-export const fetchChatMessages = (chatId) =>
-  handleRequest(api.get(`/chats/${chatId}/messages`));
+// Summary job status
+export const fetchSummaryJob = (jobId) =>
+  handleRequest(api.get(`/summary-jobs/${jobId}`));
+
+// Poll a summary job until it is done / failed (or the timeout passes)
+export const waitForSummaryJob = async (jobId, { intervalMs = 1000, timeoutMs = 60000 } = {}) => {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const job = await fetchSummaryJob(jobId);
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+  return fetchSummaryJob(jobId);
+};
+
+// Fetch a page of a chat's messages: { items (oldest → newest), next_cursor }
+// (no cursor = the latest page; pass next_cursor for the page before it)
+export const fetchChatMessages = (chatId, cursor = null, limit = 100) =>
+  handleRequest(
+    api.get(`/chats/${chatId}/messages`, { params: { limit, ...(cursor && { cursor }) } })
+  );
 
-// Fetch all chats
-export const fetchChats = () => handleRequest(api.get("/chats"));
+// Fetch a page of chats, newest first: { items, next_cursor }
+export const fetchChats = (cursor = null, limit = 50) =>
+  handleRequest(api.get("/chats", { params: { limit, ...(cursor && { cursor }) } }));
 
 // Delete chat
 export const deleteChat = (id) =>
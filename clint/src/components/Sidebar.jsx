@@ -1,7 +1,14 @@
 import { useState } from "react";
 import { Plus, Search, BookOpen, MessageCircleCodeIcon } from "lucide-react";
 
-export default function Sidebar({ onNewChat, chats = [], onSelectChat }) {
+export default function Sidebar({
+  onNewChat,
+  chats = [],
+  onSelectChat,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
+}) {
   const [search, setSearch] = useState("");
 
   const filteredChats = Array.isArray(chats)
@@ -55,6 +62,17 @@ export default function Sidebar({ onNewChat, chats = [], onSelectChat }) {
             </button>
           ))
         )}
+
+        {/* Older chats (cursor pagination) */}
+        {hasMore && (
+          <button
+            onClick={onLoadMore}
+            disabled={loadingMore}
+            className="w-full text-center px-3 py-2 rounded-xl text-xs text-gray-300 hover:bg-white/10 transition disabled:opacity-50"
+          >
+            {loadingMore ? "جارٍ التحميل..." : "عرض المزيد"}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,8 +1,10 @@
-import { useState, useRef, useEffect } from "react";
+import { useState, useRef, useEffect, useLayoutEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import {
   sendChat,
+  newIdempotencyKey,
   saveConversation,
+  waitForSummaryJob,
   fetchChats,
   deleteChat,
   fetchChatMessages,
@@ -13,7 +15,7 @@ import "@fontsource/tajawal/700.css";
 import EmotionStatus from "../components/EmotionStatus";
 import Sidebar from "../components/Sidebar";
 import PopupHestory from "../components/PopupHestory";
-import { BarChart2, LogOut, Save, Send } from "lucide-react";
+import { BarChart2, LogOut, RotateCw, Save, Send } from "lucide-react";
 
 
 export default function ChatPage() {
@@ -23,12 +25,25 @@ export default function ChatPage() {
   const [selectedChat, setSelectedChat] = useState(null);
   const [showPopup, setShowPopup] = useState(false); // 👈 تحكم في البوب أب
   const [loading, setLoading] = useState(false);
+  // next_cursor of the last page loaded (null = nothing older)
+  const [chatsCursor, setChatsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const chatEndRef = useRef(null);
+  const historyRef = useRef(null);
+  const prependedFrom = useRef(null); // scrollHeight before older messages were prepended
+  const currentChatId = useRef(null);
   const navigate = useNavigate();
 
-  // 🔹 Scroll to bottom
-  useEffect(() => {
+  // 🔹 Scroll to bottom (or keep the view in place when older messages were prepended)
+  useLayoutEffect(() => {
+    const box = historyRef.current;
+    if (box && prependedFrom.current !== null) {
+      box.scrollTop += box.scrollHeight - prependedFrom.current;
+      prependedFrom.current = null;
+      return;
+    }
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [history]);
 
@@ -41,12 +56,13 @@ export default function ChatPage() {
   // 📌 Load Chats
   const loadChats = async (loadLast = false) => {
     try {
-      const data = await fetchChats();
-      setChats(data || []);
-      console.log(chats);
-      
+      const page = await fetchChats();
+      const data = page.items || [];
+      setChats(data);
+      setChatsCursor(page.next_cursor);
+
       if (loadLast && data?.length > 0) {
-        const lastChat = data[data.length - 1];
+        const lastChat = data[0]; // newest first
         await selectChat(lastChat);
       }
     } catch (err) {
@@ -59,35 +75,99 @@ export default function ChatPage() {
     }
   };
 
+  // 📌 Next page of chats (sidebar "load more")
+  const loadMoreChats = async () => {
+    if (!chatsCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchChats(chatsCursor);
+      setChats((prev) => [
+        ...prev,
+        ...page.items.filter((c) => !prev.some((p) => p.id === c.id)),
+      ]);
+      setChatsCursor(page.next_cursor);
+    } catch (err) {
+      console.error("❌ Error loading more chats", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // =====================================================
   // 📌 Select Chat
+  const toHistoryItem = (m) => ({
+    id: m.id,
+    sender: m.sender === "user" ? "you" : "bot",
+    text: m.text,
+    emotion: m.emotion,
+  });
+
   const selectChat = async (chat) => {
     if (!chat) return;
     setSelectedChat(chat);
+    currentChatId.current = chat.id;
 
     try {
-      const msgs = await fetchChatMessages(chat.id);
-      setHistory(
-        msgs.map((m) => ({
-          sender: m.sender === "user" ? "you" : "bot",
-          text: m.text,
-          emotion: m.emotion,
-        }))
-      );
+      const page = await fetchChatMessages(chat.id);
+      setHistory(page.items.map(toHistoryItem));
+      setMessagesCursor(page.next_cursor);
     } catch (err) {
       console.error("❌ Error fetching chat messages:", err);
       setHistory([]);
+      setMessagesCursor(null);
+    }
+  };
+
+  // 📌 Older messages, loaded when the history is scrolled to the top
+  const loadOlderMessages = async () => {
+    if (!selectedChat || !messagesCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const chatId = selectedChat.id;
+      const page = await fetchChatMessages(chatId, messagesCursor);
+      if (chatId !== currentChatId.current) return; // switched chats meanwhile
+      prependedFrom.current = historyRef.current?.scrollHeight ?? null;
+      setHistory((h) => [
+        ...page.items.map(toHistoryItem).filter((m) => !h.some((x) => x.id === m.id)),
+        ...h,
+      ]);
+      setMessagesCursor(page.next_cursor);
+    } catch (err) {
+      console.error("❌ Error loading older messages:", err);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
+  const onHistoryScroll = (e) => {
+    if (e.currentTarget.scrollTop < 40) loadOlderMessages();
+  };
+
   // =====================================================
   // 📌 Send Message
+  // one idempotency key per composed message: a retry reuses it, so the server answers it only once
   const send = async () => {
     const text = String(input).trim();
     if (!text || loading) return;
 
-    setHistory((h) => [...h, { sender: "you", text }]);
+    const key = newIdempotencyKey();
+    setHistory((h) => [...h, { sender: "you", text, key }]);
     setInput("");
+    await deliver(text, key);
+  };
+
+  // 📌 Retry a failed message with its original key
+  const retry = async (message) => {
+    if (loading) return;
+    setHistory((h) =>
+      h
+        .filter((m) => m.errorFor !== message.key)
+        .map((m) => (m.key === message.key ? { ...m, failed: false } : m))
+    );
+    await deliver(message.text, message.key);
+  };
+
+  const deliver = async (text, key) => {
     setLoading(true);
 
     try {
@@ -95,7 +175,7 @@ export default function ChatPage() {
         chat_id: selectedChat?.id || null,
         message: text,
       };
-      const data = await sendChat(payload);
+      const data = await sendChat(payload, key);
 
       setHistory((h) => [
         ...h,
@@ -105,6 +185,7 @@ export default function ChatPage() {
       if (!selectedChat && data.chat_id) {
         await loadChats();
         setSelectedChat({ id: data.chat_id, title: "جديد", summary: "" });
+        currentChatId.current = data.chat_id;
       }
     } catch (err) {
       console.error("❌ Send error:", err);
@@ -113,7 +194,10 @@ export default function ChatPage() {
           ? err.response.data.detail.map((d) => d.msg).join(" | ")
           : err?.response?.data?.detail || "❌ خطأ في الإرسال";
 
-      setHistory((h) => [...h, { sender: "bot", text: msg }]);
+      setHistory((h) => [
+        ...h.map((m) => (m.key === key ? { ...m, failed: true } : m)),
+        { sender: "bot", text: msg, errorFor: key },
+      ]);
     } finally {
       setLoading(false);
     }
@@ -125,7 +209,10 @@ export default function ChatPage() {
     if (!selectedChat) return alert("❌ لا توجد محادثة محددة للحفظ");
 
     try {
-      await saveConversation({ chat_id: selectedChat.id });
+      const job = await saveConversation({ chat_id: selectedChat.id });
+      // unchanged chats come back already "done" (no job to wait for)
+      const result = job.status === "done" ? job : await waitForSummaryJob(job.job_id);
+      if (result.status === "failed") throw new Error(result.error);
       alert("✅ تم حفظ المحادثة بنجاح");
       loadChats();
     } catch (err) {
@@ -143,6 +230,8 @@ export default function ChatPage() {
       }
       setHistory([]);
       setSelectedChat(null);
+      currentChatId.current = null;
+      setMessagesCursor(null);
     } catch (err) {
       console.error("❌ Error saving before new chat:", err);
     }
@@ -157,7 +246,9 @@ export default function ChatPage() {
       setChats((prev) => prev.filter((chat) => chat.id !== id));
       if (selectedChat?.id === id) {
         setSelectedChat(null);
+        currentChatId.current = null;
         setHistory([]);
+        setMessagesCursor(null);
       }
     } catch (err) {
       console.error("❌ Delete error:", err);
@@ -182,6 +273,9 @@ const handleLogout = () => {
         onNewChat={newChat}
         chats={chats}
         onSelectChat={selectChat}
+        hasMore={Boolean(chatsCursor)}
+        loadingMore={loadingMore}
+        onLoadMore={loadMoreChats}
       />
   
       {/* Main Chat */}
@@ -222,10 +316,19 @@ const handleLogout = () => {
         </div>
       </div>
         {/* Chat History (يتحرك مع السكرول) */}
-        <div className="flex-1 overflow-y-auto p-6">
+        <div ref={historyRef} onScroll={onHistoryScroll} className="flex-1 overflow-y-auto p-6">
+          {messagesCursor && (
+            <button
+              onClick={loadOlderMessages}
+              disabled={loadingMore}
+              className="block mx-auto mb-4 text-xs text-gray-400 hover:text-white disabled:opacity-50"
+            >
+              {loadingMore ? "جارٍ التحميل..." : "عرض الرسائل الأقدم"}
+            </button>
+          )}
           {history.map((m, i) => (
             <motion.div
-              key={i}
+              key={m.id ?? `local-${i}`}
               initial={{ opacity: 0, y: 10 }}
               animate={{ opacity: 1, y: 0 }}
               transition={{ duration: 0.3 }}
@@ -242,6 +345,16 @@ const handleLogout = () => {
               >
                 <p className="whitespace-pre-wrap">{m.text}</p>
                 {m.emotion && <EmotionStatus emotion={m.emotion} />}
+                {m.failed && (
+                  <button
+                    onClick={() => retry(m)}
+                    disabled={loading}
+                    className="mt-2 flex items-center gap-1 text-xs text-blue-100 hover:text-white disabled:opacity-50"
+                  >
+                    <RotateCw size={12} />
+                    إعادة المحاولة
+                  </button>
+                )}
               </div>
             </motion.div>
           ))}
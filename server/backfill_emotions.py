@@ -0,0 +1,110 @@
+"""
+Backfill per-message emotion scores for messages stored before they were
+recorded (see services/emotion_stats.py).
+
+User messages without scores are read in id order, `--chunk-size` rows at a
+time, classified with classify_emotions_batch and written back together with
+their per-chat aggregate, one transaction per chunk. The last processed id is
+saved to `--checkpoint` after every commit, so an interrupted run picks up
+where it stopped; messages that already have scores are never counted twice.
+
+Usage (from server/):
+    python -m backfill_emotions --chunk-size 512 --batch-size 32
+    python -m backfill_emotions --reset          # ignore the checkpoint
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+from db import SessionLocal
+from models.auth_chat import Message
+from services.emotion_classifier import EMOTION_MAX_BATCH_SIZE, classify_emotions_batch, emotion_labels
+from services.emotion_stats import add_to_aggregate, encode_scores
+
+logger = logging.getLogger("backfill_emotions")
+
+
+def load_checkpoint(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f).get("last_id", 0)
+
+
+def save_checkpoint(path: str, last_id: int, processed: int):
+    # write-then-rename so a crash never leaves a half-written checkpoint
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_id": last_id, "processed": processed}, f)
+    os.replace(tmp, path)
+
+
+def next_chunk(db, after_id: int, size: int):
+    return (
+        db.query(Message.id, Message.chat_id, Message.content_en)
+        .filter(
+            Message.id > after_id,
+            Message.role == "user",
+            Message.emotion_scores.is_(None),
+        )
+        .order_by(Message.id)
+        .limit(size)
+        .all()
+    )
+
+
+def backfill(chunk_size: int, batch_size: int, checkpoint: str, limit: int | None = None) -> int:
+    last_id = load_checkpoint(checkpoint)
+    processed = 0
+    started = time.perf_counter()
+    logger.info("Starting after message id %s", last_id)
+
+    db = SessionLocal()
+    try:
+        while limit is None or processed < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - processed)
+            rows = next_chunk(db, last_id, size)
+            if not rows:
+                break
+
+            scored = [row for row in rows if row.content_en]
+            all_scores = classify_emotions_batch([row.content_en for row in scored], batch_size)
+            for row, values in zip(scored, all_scores):
+                scores = dict(zip(emotion_labels, values))
+                db.query(Message).filter(Message.id == row.id).update(
+                    {"emotion_scores": encode_scores(scores)}, synchronize_session=False
+                )
+                add_to_aggregate(db, row.chat_id, scores)
+            db.commit()
+
+            last_id = rows[-1].id
+            processed += len(rows)
+            save_checkpoint(checkpoint, last_id, processed)
+            rate = processed / (time.perf_counter() - started)
+            logger.info("Processed %d messages (last id %d, %.1f msg/s)", processed, last_id, rate)
+    finally:
+        db.close()
+
+    logger.info("Done: %d messages in %.1fs", processed, time.perf_counter() - started)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=512, help="messages read and committed per chunk")
+    parser.add_argument("--batch-size", type=int, default=EMOTION_MAX_BATCH_SIZE, help="texts per forward pass")
+    parser.add_argument("--checkpoint", default="emotion_backfill.json")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many messages")
+    parser.add_argument("--reset", action="store_true", help="start from the first message")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    backfill(args.chunk_size, args.batch_size, args.checkpoint, args.limit)
+
+
+if __name__ == "__main__":
+    main()
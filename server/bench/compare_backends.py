@@ -0,0 +1,123 @@
+"""
+Accuracy-vs-speed comparison of the inference backends (torch / int8 / onnx)
+on the fixed sample set in bench/samples.json.
+
+fp32 PyTorch outputs are the reference: translations are scored by token F1
+against them, the emotion model by top-label agreement and mean absolute
+probability difference. Timings are ms to run the whole sample set one
+item at a time (as requests are served), averaged over --repeats.
+
+Usage (from server/):
+    python -m bench.compare_backends --backends torch int8 onnx --repeats 3 --out backends.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import torch
+import torch.nn.functional as F
+
+from services.inference_backend import BACKENDS, load_seq2seq, load_classifier
+from services.translataion import AR_EN_MODEL, EN_AR_MODEL, _translate_batch
+from services.emotion_classifier import EMOTION_MODEL
+
+SAMPLES_PATH = os.path.join(os.path.dirname(__file__), "samples.json")
+
+
+def token_f1(hypothesis: str, reference: str) -> float:
+    hyp, ref = Counter(hypothesis.split()), Counter(reference.split())
+    overlap = sum((hyp & ref).values())
+    if not hyp or not ref or not overlap:
+        return float(hyp == ref)
+    precision, recall = overlap / sum(hyp.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def classify_probs(tokenizer, model, texts: list[str]) -> list[list[float]]:
+    inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
+    with torch.no_grad():
+        logits = model(**inputs).logits
+    return F.softmax(torch.as_tensor(logits), dim=1).tolist()
+
+
+def timed(func, repeats: int):
+    # one warm-up call, then the mean of `repeats` timed calls (one at a time, as served)
+    result = func()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return result, (time.perf_counter() - started) * 1000 / repeats
+
+
+def run_backend(backend: str, samples: dict, repeats: int) -> dict:
+    load_started = time.perf_counter()
+    ar_en = load_seq2seq(AR_EN_MODEL, backend)
+    en_ar = load_seq2seq(EN_AR_MODEL, backend)
+    emotion = load_classifier(EMOTION_MODEL, backend)
+    load_s = time.perf_counter() - load_started
+
+    def per_item(fn, texts):
+        return [fn([t])[0] for t in texts]
+
+    ar_en_out, ar_en_ms = timed(lambda: per_item(lambda t: _translate_batch(lambda: ar_en, t), samples["ar"]), repeats)
+    en_ar_out, en_ar_ms = timed(lambda: per_item(lambda t: _translate_batch(lambda: en_ar, t), samples["en"]), repeats)
+    probs, emotion_ms = timed(lambda: per_item(lambda t: classify_probs(*emotion, t), samples["en"]), repeats)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "ar_en_ms": round(ar_en_ms, 1),
+        "en_ar_ms": round(en_ar_ms, 1),
+        "emotion_ms": round(emotion_ms, 1),
+        "outputs": {"ar_en": ar_en_out, "en_ar": en_ar_out, "emotion": probs},
+    }
+
+
+def score(result: dict, reference: dict) -> dict:
+    out, ref = result["outputs"], reference["outputs"]
+    f1 = lambda key: sum(token_f1(h, r) for h, r in zip(out[key], ref[key])) / len(ref[key])
+    top = lambda p: max(range(len(p)), key=p.__getitem__)
+    pairs = list(zip(out["emotion"], ref["emotion"]))
+    return {
+        "ar_en_f1": round(f1("ar_en"), 3),
+        "en_ar_f1": round(f1("en_ar"), 3),
+        "emotion_top1_agree": round(sum(top(p) == top(r) for p, r in pairs) / len(pairs), 3),
+        "emotion_mean_abs_diff": round(
+            sum(abs(a - b) for p, r in pairs for a, b in zip(p, r)) / sum(len(r) for _, r in pairs), 4
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--out", help="write full results (incl. outputs) as JSON")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        samples = json.load(f)
+
+    torch.manual_seed(0)
+    reference = run_backend("torch", samples, args.repeats)
+    results = [reference] + [run_backend(b, samples, args.repeats) for b in args.backends if b != "torch"]
+
+    print(f"{'backend':<8} {'load s':>7} {'ar→en ms':>9} {'en→ar ms':>9} {'emo ms':>7} "
+          f"{'ar→en F1':>9} {'en→ar F1':>9} {'emo top1':>9} {'emo |Δp|':>9}")
+    for result in results:
+        result["quality"] = score(result, reference)
+        q = result["quality"]
+        print(f"{result['backend']:<8} {result['load_s']:>7} {result['ar_en_ms']:>9} {result['en_ar_ms']:>9} "
+              f"{result['emotion_ms']:>7} {q['ar_en_f1']:>9} {q['en_ar_f1']:>9} "
+              f"{q['emotion_top1_agree']:>9} {q['emotion_mean_abs_diff']:>9}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
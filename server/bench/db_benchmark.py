@@ -0,0 +1,153 @@
+"""
+Seed a large synthetic dataset and time the chat-history queries with and
+without the indexes / WAL settings from migrations.py and db.py.
+
+    python -m bench.db_benchmark --users 200 --chats 50 --messages 40 --out db_bench.json
+
+"before" = plain SQLite (rollback journal, no secondary indexes);
+"after"  = WAL + pragmas + indexes (what the app runs with now).
+Each query is timed against random users/chats, reported as p50/p95 in ms.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from db import Base, create_db_engine
+from migrations import MIGRATIONS, run_migrations
+from models.auth_chat import User, Chat, Message, ChatSummary
+from routers.save_chat_router import get_chats, get_chat_messages
+from routers.chat_router import _load_history
+from services.conversation_context import context_store
+from services.summarizer import load_chat_messages
+
+INDEX_NAMES = ["ix_chats_user_id_created_at", "ix_messages_chat_id_created_at"]
+
+
+def seed(engine, users: int, chats: int, messages: int):
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": u, "username": f"user{u}", "email": f"user{u}@example.com", "hashed_password": "x"}
+            for u in range(1, users + 1)
+        ])
+        chat_rows, summary_rows, message_rows = [], [], []
+        chat_id = message_id = 0
+        # interleave users so each user's chats are scattered through the table, like real traffic
+        for c in range(chats):
+            for u in range(1, users + 1):
+                chat_id += 1
+                created = start + timedelta(minutes=chat_id)
+                chat_rows.append({"id": chat_id, "user_id": u, "created_at": created})
+                if rng.random() < 0.7:
+                    summary_rows.append({"chat_id": chat_id, "title": f"Title {chat_id}", "summary": "Summary",
+                                         "dominant_emotion": "حزن", "created_at": created})
+        conn.execute(Chat.__table__.insert(), chat_rows)
+        conn.execute(ChatSummary.__table__.insert(), summary_rows)
+
+        for m in range(messages):
+            for chat in chat_rows:
+                message_id += 1
+                message_rows.append({
+                    "id": message_id, "chat_id": chat["id"], "role": "user" if m % 2 == 0 else "assistant",
+                    "content_ar": "مرحبا كيف حالك اليوم", "content_en": "Hello, how are you today?",
+                    "created_at": chat["created_at"] + timedelta(seconds=m),
+                })
+            if len(message_rows) >= 50_000:
+                conn.execute(Message.__table__.insert(), message_rows)
+                message_rows.clear()
+        if message_rows:
+            conn.execute(Message.__table__.insert(), message_rows)
+    return chat_id
+
+
+def measure(engine, users: int, total_chats: int, samples: int) -> dict:
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(1)
+    queries = {
+        "chats_page": lambda db, u, c: get_chats(limit=50, cursor=None, include_total=False,
+                                                 current_user=SimpleNamespace(id=u), db=db),
+        "chats_page_with_total": lambda db, u, c: get_chats(limit=50, cursor=None, include_total=True,
+                                                            current_user=SimpleNamespace(id=u), db=db),
+        "messages_page": lambda db, u, c: get_chat_messages(c, limit=100, cursor=None, include_total=False,
+                                                            current_user=SimpleNamespace(id=u), db=db),
+        "context_cold_load": lambda db, u, c: (context_store.discard(c), _load_history(db, u, c)),
+        "summary_full_history": lambda db, u, c: load_chat_messages(db, c),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(samples):
+            chat_id = rng.randint(1, total_chats)
+            user_id = (chat_id - 1) % users + 1
+            db = Session()
+            try:
+                started = time.perf_counter()
+                query(db, user_id, chat_id)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+        timings.sort()
+        results[name] = {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=50, help="chats per user")
+    parser.add_argument("--messages", type=int, default=40, help="messages per chat")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        url = f"sqlite:///{path}"
+
+        # before: default journal mode, no secondary indexes
+        plain = create_engine(url, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=plain)
+        with plain.begin() as conn:
+            for name in INDEX_NAMES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        started = time.perf_counter()
+        total_chats = seed(plain, args.users, args.chats, args.messages)
+        print(f"seeded {total_chats} chats / {total_chats * args.messages} messages "
+              f"in {time.perf_counter() - started:.1f}s")
+        before = measure(plain, args.users, total_chats, args.samples)
+        plain.dispose()
+
+        # after: the app's engine (WAL + pragmas) and migrations (indexes + ANALYZE)
+        tuned = create_db_engine(url)
+        with tuned.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+        run_migrations(tuned)
+        after = measure(tuned, args.users, total_chats, args.samples)
+        tuned.dispose()
+
+    print(f"\n{'query':<24} {'before p50':>11} {'before p95':>11} {'after p50':>10} {'after p95':>10}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<24} {b['p50_ms']:>11} {b['p95_ms']:>11} {a['p50_ms']:>10} {a['p95_ms']:>10}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": vars(args), "migrations": [m[0] for m in MIGRATIONS],
+                       "before": before, "after": after}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
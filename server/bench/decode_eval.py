@@ -0,0 +1,145 @@
+"""
+Quality / latency evaluation of translation decoding policies
+(services/decoding.py) on the sample set in bench/samples.json.
+
+Every policy translates the Arabic samples to English and the English ones
+to Arabic, --batch-size texts per generate() call (1 = as requests are
+served one at a time). The reference is the checkpoint's own decoding (what
+ran before the policy existed) unless --references gives human translations
+as {"ar_en": [...], "en_ar": [...]}. Reported per policy and direction:
+chrF and token F1 against the reference, exact matches, the share of
+outputs that hit the max_new_tokens cap, and p50/p95 ms per call.
+
+Policies: checkpoint (no policy: the model's generation config), greedy,
+beam2, beam4 (beam search at any length, output capped by the length
+ratio) and adaptive (the DECODE_* environment settings, as served). Set
+DECODE_* variables to try other adaptive settings.
+
+Usage (from server/):
+    python -m bench.decode_eval --policies greedy beam4 adaptive --batch-size 1 --out decoding.json
+    DECODE_BEAM_MAX_TOKENS=48 python -m bench.decode_eval --policies adaptive
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+import torch
+
+from bench.compare_backends import SAMPLES_PATH, token_f1
+from bench.e2e import percentiles
+from services.decoding import DecodingPolicy
+from services.inference_backend import load_seq2seq
+from services.translataion import AR_EN_MODEL, EN_AR_MODEL, _translate_batch
+
+POLICIES = ("checkpoint", "greedy", "beam2", "beam4", "adaptive")
+
+
+def make_policy(name: str, direction: str) -> DecodingPolicy | None:
+    if name == "checkpoint":
+        return None
+    if name == "greedy":
+        return DecodingPolicy(direction, num_beams=1)
+    if name.startswith("beam"):
+        return DecodingPolicy(direction, num_beams=int(name[4:]), greedy_max_tokens=0, beam_max_tokens=10 ** 6)
+    return DecodingPolicy(direction)
+
+
+def chrf(hypothesis: str, reference: str, max_n: int = 6, beta: float = 2.0) -> float:
+    """Character n-gram F-score (chrF, spaces ignored), 0-100."""
+    hyp, ref = hypothesis.replace(" ", ""), reference.replace(" ", "")
+    precisions, recalls = [], []
+    for n in range(1, max_n + 1):
+        hyp_ngrams = Counter(hyp[i:i + n] for i in range(len(hyp) - n + 1))
+        ref_ngrams = Counter(ref[i:i + n] for i in range(len(ref) - n + 1))
+        if not hyp_ngrams or not ref_ngrams:
+            continue
+        overlap = sum((hyp_ngrams & ref_ngrams).values())
+        precisions.append(overlap / sum(hyp_ngrams.values()))
+        recalls.append(overlap / sum(ref_ngrams.values()))
+    if not precisions:
+        return 100.0 if hyp == ref else 0.0
+    p, r = sum(precisions) / len(precisions), sum(recalls) / len(recalls)
+    if not p and not r:
+        return 0.0
+    return 100 * (1 + beta ** 2) * p * r / (beta ** 2 * p + r)
+
+
+def translate_all(model, texts: list[str], batch_size: int, policy: DecodingPolicy | None):
+    outputs, latencies = [], []
+    _translate_batch(lambda: model, texts[:1], policy)   # warm-up
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        started = time.perf_counter()
+        outputs.extend(_translate_batch(lambda: model, batch, policy))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return outputs, latencies
+
+
+def hit_length_cap(model, sources: list[str], outputs: list[str], policy: DecodingPolicy | None) -> float | None:
+    # per item, so exact for --batch-size 1 (a batch shares the cap of its longest source)
+    if policy is None:
+        return None
+    tokenizer, _ = model
+    hits = 0
+    for source, output in zip(sources, outputs):
+        cap = policy.max_new_tokens(len(tokenizer(source, truncation=True)["input_ids"]))
+        # +1: the decoder start token is part of the generated sequence
+        hits += len(tokenizer(text_target=output)["input_ids"]) + 1 >= cap
+    return round(hits / len(sources), 3)
+
+
+def evaluate(model, direction: str, sources: list[str], references: list[str],
+             policy_name: str, batch_size: int) -> dict:
+    policy = make_policy(policy_name, direction)
+    outputs, latencies = translate_all(model, sources, batch_size, policy)
+    pairs = list(zip(outputs, references))
+    return {
+        "chrf": round(sum(chrf(h, r) for h, r in pairs) / len(pairs), 2),
+        "token_f1": round(sum(token_f1(h, r) for h, r in pairs) / len(pairs), 3),
+        "exact": round(sum(h == r for h, r in pairs) / len(pairs), 3),
+        "hit_cap": hit_length_cap(model, sources, outputs, policy),
+        **percentiles(latencies),
+        "outputs": outputs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=POLICIES)
+    parser.add_argument("--batch-size", type=int, default=1, help="texts per generate() call")
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--references", help='human translations: {"ar_en": [...], "en_ar": [...]}')
+    parser.add_argument("--out", help="write full results (incl. outputs) as JSON")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        samples = json.load(f)
+    torch.manual_seed(0)
+    models = {"ar_en": load_seq2seq(AR_EN_MODEL), "en_ar": load_seq2seq(EN_AR_MODEL)}
+    sources = {"ar_en": samples["ar"], "en_ar": samples["en"]}
+
+    if args.references:
+        with open(args.references, encoding="utf-8") as f:
+            references = json.load(f)
+    else:
+        references = {key: translate_all(models[key], sources[key], 1, None)[0] for key in models}
+
+    results = {}
+    print(f"{'policy':<10} {'dir':<6} {'chrF':>6} {'tok F1':>7} {'exact':>6} {'hit cap':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in args.policies:
+        results[name] = {}
+        for key in models:
+            row = evaluate(models[key], key.replace("_", "-"), sources[key], references[key], name, args.batch_size)
+            results[name][key] = row
+            print(f"{name:<10} {key:<6} {row['chrf']:>6} {row['token_f1']:>7} {row['exact']:>6} "
+                  f"{str(row['hit_cap'] if row['hit_cap'] is not None else '-'):>8} {row['p50_ms']:>8} {row['p95_ms']:>8}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "references": references, "results": results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+End-to-end latency benchmark: /api/chat, /chats, /chats/{id}/messages and
+/save-conversation (plus the summary job it queues) at a given concurrency.
+
+Each virtual user registers, then runs --conversations conversations of
+--turns chat turns, lists its chats, reads the chat history and saves the
+conversation, waiting for the summary job to finish. Reported per endpoint:
+count, errors, throughput and p50/p95/p99 latency; per /api/chat stage
+(translate_in, load_history, classify, llm, translate_out, persist_*) from
+the `timings` the endpoint returns.
+
+By default everything runs offline in this process: the app on a temporary
+SQLite database, bench.mock_llm as the LLM, and with --models stub the
+translation / emotion models replaced by stand-ins that sleep
+--stub-translate-ms / --stub-classify-ms per batch. --models real loads the
+configured checkpoints (point AR_EN_MODEL / EN_AR_MODEL / EMOTION_MODEL at
+tiny local Marian / DistilRoBERTa dirs to stay offline). --base-url targets
+an already running server instead (raise LOGIN_BURST_PER_IP there first).
+Replies carrying the app's "❌" error marker (a model or LLM call failed and
+the fallback text was returned) count as errors, and the run exits non-zero.
+
+    python -m bench.e2e --users 8 --turns 4 --out e2e_$(git rev-parse --short HEAD).json
+    python -m bench.e2e --users 8 --turns 4 --compare e2e_base.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+import uvicorn
+
+ERROR_MARKER = "❌"
+
+MESSAGES = [
+    "أشعر بالقلق الشديد قبل الامتحانات.",
+    "لا أستطيع النوم جيدا منذ أسبوع.",
+    "أحيانا أشعر بالوحدة حتى بين أصدقائي. لا أعرف لماذا.",
+    "العمل يضغط علي كثيرا وأشعر بالتعب طوال الوقت.",
+]
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def rank(q):
+        return round(ordered[max(0, int(len(ordered) * q + 0.5) - 1)], 1)
+
+    return {"n": len(ordered), "p50_ms": rank(0.50), "p95_ms": rank(0.95), "p99_ms": rank(0.99), "max_ms": round(ordered[-1], 1)}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    # own thread + event loop, so the server never competes with the load generator's loop
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def install_stub_models(translate_ms: float, classify_ms: float):
+    import services.translataion as translation
+    import services.emotion_classifier as emotion
+
+    # the batchers call _generate_batch (outputs + decoding mode), not _translate_batch
+    def generate_batch(loader, texts, policy=None):
+        time.sleep(translate_ms / 1000)
+        return [f"[{len(t)} chars]" for t in texts], "greedy"
+
+    def classify(text_en):
+        time.sleep(classify_ms / 1000)
+        return {"sadness": 55.0, "fear": 20.0, "neutral": 12.0, "anger": 6.0, "joy": 4.0, "surprise": 2.0, "disgust": 1.0}
+
+    translation._generate_batch = generate_batch
+    emotion.classify_emotion = classify
+
+
+def start_local_stack(args) -> str:
+    from bench.mock_llm import create_app as create_mock_llm
+
+    llm_port = free_port()
+    serve_in_thread(create_mock_llm(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms), llm_port)
+
+    workdir = tempfile.mkdtemp(prefix="e2e-bench-")
+    os.environ.update({
+        "API_URL": f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "TRANSLATION_CACHE_PATH": "",
+        "BCRYPT_ROUNDS": "4",
+        "LOGIN_BURST_PER_IP": str(max(10, args.users * 2)),
+        "PRELOAD_MODELS": "1" if args.models == "real" else "0",
+    })
+    if args.models == "stub":
+        install_stub_models(args.stub_translate_ms, args.stub_classify_ms)
+
+    from main import app   # imported only now: settings are read at import time
+    from services.model_warmup import warm_up_models
+
+    if args.models == "real":
+        asyncio.run(warm_up_models())
+    app_port = free_port()
+    serve_in_thread(app, app_port)
+    return f"http://127.0.0.1:{app_port}"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.stages = defaultdict(list)
+        self.failed_replies = []
+
+    async def call(self, name: str, request, ok=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        if response.status_code not in ok:
+            self.errors[name] += 1
+            return None
+        return response
+
+
+async def virtual_user(client: httpx.AsyncClient, rec: Recorder, args, index: int):
+    username = f"bench-{index}-{uuid.uuid4().hex[:6]}"
+    password = "bench-password"
+    await client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+    login = await client.post("/auth/login", json={"username": username, "password": password})
+    login.raise_for_status()
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    for _ in range(args.conversations):
+        chat_id = None
+        for turn in range(args.turns):
+            body = {"message": MESSAGES[(index + turn) % len(MESSAGES)], "chat_id": chat_id}
+            response = await rec.call("chat", client.post("/api/chat", json=body, headers=headers))
+            if response is None:
+                continue
+            data = response.json()
+            chat_id = data["chat_id"]
+            if ERROR_MARKER in (data.get("response") or ""):
+                # a 200 carrying the fallback text: the turn did not really run
+                rec.errors["chat"] += 1
+                rec.failed_replies.append(data["response"])
+            for stage, ms in (data.get("timings") or {}).items():
+                rec.stages[stage].append(ms)
+        if chat_id is None:
+            continue
+
+        await rec.call("chats", client.get("/chats", params={"limit": 20}, headers=headers))
+        await rec.call("messages", client.get(f"/chats/{chat_id}/messages", headers=headers))
+
+        started = time.perf_counter()
+        response = await rec.call("save_conversation", client.post("/save-conversation", json={"chat_id": chat_id}, headers=headers), ok=(200, 202))
+        if response is None:
+            continue
+        job = response.json()   # already "done" when the stored summary was still fresh
+        while job.get("status") not in ("done", "failed"):
+            await asyncio.sleep(0.05)
+            job = (await client.get(f"/summary-jobs/{job['job_id']}", headers=headers)).json()
+        if job["status"] == "done":
+            rec.latencies["summary_job"].append((time.perf_counter() - started) * 1000)
+        else:
+            rec.errors["summary_job"] += 1
+
+
+async def run_load(base_url: str, args) -> dict:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, rec, args, i) for i in range(args.users)))
+        wall_s = time.perf_counter() - started
+
+    requests = sum(len(v) for k, v in rec.latencies.items() if k != "summary_job")
+    endpoints = {
+        name: {**percentiles(samples), "errors": rec.errors[name], "rps": round(len(samples) / wall_s, 2)}
+        for name, samples in rec.latencies.items()
+    }
+    for name, errors in rec.errors.items():
+        endpoints.setdefault(name, {"n": 0, "errors": errors, "rps": 0.0})
+    return {
+        "wall_s": round(wall_s, 2),
+        "throughput_rps": round(requests / wall_s, 2),
+        "endpoints": endpoints,
+        "stages": {stage: percentiles(samples) for stage, samples in sorted(rec.stages.items())},
+        "failed_replies": len(rec.failed_replies),
+        "failed_reply_sample": rec.failed_replies[0] if rec.failed_replies else None,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    def delta(section, name, key):
+        if not baseline:
+            return ""
+        old = baseline.get(section, {}).get(name, {}).get(key)
+        new = report[section].get(name, {}).get(key)
+        if not old or new is None:
+            return ""
+        return f" ({(new - old) / old * 100:+.0f}%)"
+
+    print(f"\nthroughput: {report['throughput_rps']} req/s over {report['wall_s']}s")
+    for section in ("endpoints", "stages"):
+        print(f"\n{section[:-1]:<20} {'n':>6} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+        for name, row in report[section].items():
+            cells = [f"{str(row.get(k, '-')) + delta(section, name, k):>16}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"{name:<20} {row.get('n', 0):>6} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="benchmark a running server instead of the local stack")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--conversations", type=int, default=2, help="conversations per user")
+    parser.add_argument("--turns", type=int, default=4, help="chat turns per conversation")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--stub-translate-ms", type=float, default=40)
+    parser.add_argument("--stub-classify-ms", type=float, default=15)
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_local_stack(args)
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "settings": vars(args),
+        **asyncio.run(run_load(base_url, args)),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"compared with {args.compare} (commit {baseline.get('commit')})")
+    print_report(report, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["failed_replies"]:
+        sys.exit(f"{report['failed_replies']} chat replies carried the error marker, "
+                 f"e.g. {report['failed_reply_sample']!r}: the latencies above are not a valid run")
+
+
+if __name__ == "__main__":
+    main()
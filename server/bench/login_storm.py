@@ -0,0 +1,140 @@
+"""
+Login storm vs chat latency.
+
+Measures authenticated /api/chat latency on its own, then again while
+--storm-concurrency clients hammer /auth/login. Before this change bcrypt
+ran on the shared request threadpool, so a storm inflated chat latency;
+with the dedicated hash pool, the queue limit and login rate limiting
+it should stay close to the baseline.
+
+Each storm login claims one of --client-ips addresses via X-Forwarded-For
+(uvicorn trusts it from 127.0.0.1 by default), so the per-IP limiter sees
+many clients instead of refusing nearly everything from one. Logins are
+reported as accepted, rate_limited (429: per-IP/per-username buckets,
+LOGIN_RATE_* settings) and busy (503: hash pool queue full) apart.
+
+    python -m bench.mock_llm --port 9000 &
+    API_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn main:app --port 8000 &
+
+    python -m bench.login_storm --base-url http://127.0.0.1:8000 --seconds 20 --out login_storm.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+async def register_and_login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    await client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def chat_loop(client: httpx.AsyncClient, token: str, stop: asyncio.Event, latencies: list[float]):
+    headers = {"Authorization": f"Bearer {token}"}
+    chat_id = None
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/api/chat", json={"message": "أشعر بالقلق", "chat_id": chat_id}, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code == 200:
+            chat_id = response.json().get("chat_id", chat_id)
+
+
+def client_ip(i: int) -> str:
+    i += 1   # skip 10.0.0.0
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+async def login_loop(client: httpx.AsyncClient, worker: int, usernames: list[str], client_ips: int,
+                     password: str, stop: asyncio.Event, statuses: Counter):
+    i = worker
+    while not stop.is_set():
+        username = usernames[i % len(usernames)]
+        headers = {"X-Forwarded-For": client_ip(i % client_ips)}
+        i += 1
+        response = await client.post("/auth/login", json={"username": username, "password": password}, headers=headers)
+        statuses[response.status_code] += 1
+
+
+def login_summary(statuses: Counter, seconds: float) -> dict:
+    total = sum(statuses.values())
+    return {
+        "logins": dict(statuses),
+        "logins_per_s": round(total / seconds, 1),
+        "accepted_per_s": round(statuses[200] / seconds, 1),
+        "rate_limited": statuses[429],
+        "busy": statuses[503],
+    }
+
+
+async def phase(base_url: str, token: str, seconds: float, chat_clients: int,
+                storm: int, usernames: list[str], client_ips: int, password: str) -> dict:
+    stop = asyncio.Event()
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        tasks = [asyncio.create_task(chat_loop(client, token, stop, latencies)) for _ in range(chat_clients)]
+        tasks += [
+            asyncio.create_task(login_loop(client, w, usernames, client_ips, password, stop, statuses))
+            for w in range(storm)
+        ]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return {"chat": percentiles(latencies), **login_summary(statuses, seconds)}
+
+
+async def run(args) -> dict:
+    password = "storm-password"
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        token = await register_and_login(client, f"bench-{uuid.uuid4().hex[:8]}", password)
+        usernames = [f"storm-{uuid.uuid4().hex[:8]}" for _ in range(args.usernames)]
+        for username in usernames:
+            await client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+
+    baseline = await phase(args.base_url, token, args.seconds, args.chat_clients, 0, usernames, args.client_ips, password)
+    print("baseline:", baseline)
+    storm = await phase(args.base_url, token, args.seconds, args.chat_clients, args.storm_concurrency, usernames,
+                        args.client_ips, password)
+    print("storm:   ", storm)
+    return {"baseline": baseline, "storm": storm, "settings": vars(args)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--chat-clients", type=int, default=4)
+    parser.add_argument("--storm-concurrency", type=int, default=64)
+    parser.add_argument("--usernames", type=int, default=50, help="distinct accounts the storm logs in as")
+    parser.add_argument("--client-ips", type=int, default=1024, help="distinct X-Forwarded-For addresses the storm uses")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
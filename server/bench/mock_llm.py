@@ -0,0 +1,79 @@
+"""
+Local mock of an OpenAI-compatible chat completions endpoint, for testing the
+LLM client and for offline benchmarks.
+
+Usage (from server/):
+    python -m bench.mock_llm --port 8001 --latency-ms 300 --jitter-ms 100 --fail-rate 0.1
+    API_URL=http://127.0.0.1:8001/v1/chat/completions uvicorn main:app
+
+Failures are returned as 503 (or 429 with --fail-status 429) so the client's
+retry and circuit-breaker paths can be exercised.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHAT_REPLY = (
+    "Thank you for sharing that with me. It sounds like you have been carrying a lot lately. "
+    "What do you think makes these feelings stronger? I am here to listen."
+)
+SUMMARY_REPLY = "Title: Coping with daily stress\nSummary: The user talked about stress and how to manage it."
+
+
+def create_app(latency_ms: float = 200, jitter_ms: float = 0, fail_rate: float = 0.0,
+               fail_status: int = 503, token_delay_ms: float = 20) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+        if random.random() < fail_rate:
+            return JSONResponse({"error": "mock failure"}, status_code=fail_status, headers={"Retry-After": "1"})
+
+        system_prompt = body["messages"][0]["content"] if body.get("messages") else ""
+        content = SUMMARY_REPLY if "summarize the conversation" in system_prompt else CHAT_REPLY
+
+        if not body.get("stream"):
+            return {
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            }
+
+        async def tokens():
+            for word in content.split(" "):
+                chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_delay_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(tokens(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.fail_rate, args.fail_status, args.token_delay_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
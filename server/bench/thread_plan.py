@@ -0,0 +1,141 @@
+"""
+Throughput of concurrent model calls with torch's default threading vs the
+inference thread plan (services/thread_plan.py), at several worker counts.
+
+For every --workers N and mode, N processes (as N server workers on this
+box) load the models and then, for --duration seconds, keep the same
+threads busy as a loaded worker does: one per translation direction
+(_translate_batch with the served decoding policy) and INFERENCE_WORKERS
+running classify_emotion, on the texts of bench/samples.json. Reported:
+model calls/s over all processes, p50/p95 ms per call type, and the
+speed-up of "planned" over "default".
+
+    python -m bench.thread_plan --workers 1 2 4 --duration 20 --out threads.json
+    python -m bench.thread_plan --workers 4 --affinity worker model
+
+Run it on the machine (or container limits) you deploy to: the plan
+depends on the cores and CPU quota it detects.
+"""
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+
+from bench.compare_backends import SAMPLES_PATH
+from bench.e2e import percentiles
+
+
+def _call_loop(name, call, texts, role, deadline, latencies, pin):
+    if pin:
+        from services.thread_plan import pin_current_thread
+        pin_current_thread(role)
+    i = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        call(texts[i % len(texts)])
+        latencies[name].append((time.perf_counter() - started) * 1000)
+        i += 1
+
+
+def run_worker(index: int, workers: int, mode: str, affinity: str, duration: float, samples: dict, barrier, results):
+    import torch
+    from services.executor import INFERENCE_WORKERS
+    from services.thread_plan import INFERENCE_ROLE, apply_thread_plan, plan_threads
+    from services.translataion import (
+        _translate_batch, ar_to_en_policy, en_to_ar_policy, load_ar_to_en, load_en_to_ar,
+    )
+    from services.emotion_classifier import classify_emotion, load_emotion_model
+
+    plan = None
+    if mode == "planned":
+        plan = apply_thread_plan(plan_threads(workers=workers, worker_index=index, affinity=affinity))
+
+    calls = [
+        ("translate_ar_en", lambda t: _translate_batch(load_ar_to_en, [t], ar_to_en_policy), samples["ar"], "translate-ar-en"),
+        ("translate_en_ar", lambda t: _translate_batch(load_en_to_ar, [t], en_to_ar_policy), samples["en"], "translate-en-ar"),
+    ] + [("classify_emotion", classify_emotion, samples["en"], INFERENCE_ROLE)] * INFERENCE_WORKERS
+    load_emotion_model()
+    for _, call, texts, _ in calls[:3]:   # load + warm each model
+        call(texts[0])
+
+    barrier.wait()
+    latencies = defaultdict(list)
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_call_loop, args=(name, call, texts, role, deadline, latencies, plan is not None))
+        for name, call, texts, role in calls
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({"index": index, "intra_op": torch.get_num_threads(), "latencies": dict(latencies)})
+
+
+def run_case(workers: int, mode: str, affinity: str, duration: float, samples: dict) -> dict:
+    # spawn: each process starts torch fresh, as a server worker does
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=run_worker, args=(i, workers, mode, affinity, duration, samples, barrier, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    merged = defaultdict(list)
+    for report in reports:
+        for name, samples_ms in report["latencies"].items():
+            merged[name].extend(samples_ms)
+    total = sum(len(v) for v in merged.values())
+    return {
+        "workers": workers,
+        "mode": mode,
+        "affinity": affinity if mode == "planned" else None,
+        "intra_op": sorted({r["intra_op"] for r in reports}),
+        "calls_per_s": round(total / duration, 2),
+        "calls": {name: percentiles(samples_ms) for name, samples_ms in sorted(merged.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker process counts to try")
+    parser.add_argument("--affinity", nargs="+", default=["off"], choices=("off", "worker", "model"),
+                        help="pinning modes to try for the planned runs")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per case")
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        samples = json.load(f)
+
+    rows = []
+    print(f"{'workers':>7} {'mode':<16} {'intra':>6} {'calls/s':>8} {'vs default':>10} "
+          f"{'ar→en p95':>10} {'en→ar p95':>10} {'emo p95':>8}")
+    for workers in args.workers:
+        baseline = run_case(workers, "default", "off", args.duration, samples)
+        cases = [baseline] + [run_case(workers, "planned", a, args.duration, samples) for a in args.affinity]
+        for row in cases:
+            row["speedup"] = round(row["calls_per_s"] / baseline["calls_per_s"], 2) if baseline["calls_per_s"] else None
+            label = row["mode"] if row["affinity"] in (None, "off") else f"planned/{row['affinity']}"
+            p95 = lambda name: row["calls"].get(name, {}).get("p95_ms", "-")
+            print(f"{workers:>7} {label:<16} {','.join(map(str, row['intra_op'])):>6} {row['calls_per_s']:>8} "
+                  f"{str(row['speedup']):>10} {p95('translate_ar_en'):>10} {p95('translate_en_ar'):>10} "
+                  f"{p95('classify_emotion'):>8}")
+        rows.extend(cases)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"settings": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-worker memory report for a multi-process server.
+
+RSS counts shared pages in every process, so it overstates the real cost of
+N workers; PSS splits shared pages between the processes that map them and
+sums to the true footprint. Run it against both serving modes:
+
+    uvicorn main:app --workers 4                  # before: one model copy per worker
+    gunicorn -c gunicorn.conf.py main:app         # after: weights shared copy-on-write
+
+    python -m bench.worker_memory --pid <master pid> --label before --out mem_before.json
+    python -m bench.worker_memory --pid <master pid> --label after  --out mem_after.json
+
+Linux only (reads /proc/<pid>/smaps_rollup). Send a few requests first so
+every worker has warmed its models.
+"""
+import argparse
+import json
+import os
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def children(pid: int) -> list[int]:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def memory(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in FIELDS:
+                values[key] = int(rest.split()[0]) // 1024   # kB → MB
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pid", type=int, required=True, help="master / supervisor process id")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    rows = [{"pid": args.pid, "role": "master", **memory(args.pid)}]
+    rows += [{"pid": pid, "role": "worker", **memory(pid)} for pid in children(args.pid)]
+    workers = [r for r in rows if r["role"] == "worker"]
+
+    print(f"{'pid':>8} {'role':<7} " + " ".join(f"{f + ' MB':>17}" for f in FIELDS))
+    for row in rows:
+        print(f"{row['pid']:>8} {row['role']:<7} " + " ".join(f"{row.get(f, 0):>17}" for f in FIELDS))
+
+    report = {
+        "label": args.label,
+        "workers": len(workers),
+        "total_rss_mb": sum(r.get("Rss", 0) for r in rows),
+        "total_pss_mb": sum(r.get("Pss", 0) for r in rows),
+        "avg_worker_pss_mb": round(sum(r.get("Pss", 0) for r in workers) / len(workers), 1) if workers else 0,
+        "avg_worker_private_mb": round(
+            sum(r.get("Private_Clean", 0) + r.get("Private_Dirty", 0) for r in workers) / len(workers), 1
+        ) if workers else 0,
+        "processes": rows,
+    }
+    print(f"\ntotal RSS {report['total_rss_mb']} MB | total PSS {report['total_pss_mb']} MB | "
+          f"avg worker PSS {report['avg_worker_pss_mb']} MB | avg worker private {report['avg_worker_private_mb']} MB")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
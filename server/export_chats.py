@@ -0,0 +1,58 @@
+"""
+Bulk export of chats, messages and summaries as NDJSON (see
+services/chat_export.py for the record format), for every user or one.
+
+Rows are streamed from the database `--chunk-size` at a time and written as
+they arrive, so memory stays flat whatever the archive size. Output is
+gzip-compressed when `--out` ends in ".gz" (or with --gzip); "-" writes to
+stdout. The file is written next to its final name and renamed when complete.
+
+Usage (from server/):
+    python -m export_chats --out archive.ndjson.gz
+    python -m export_chats --user-id 42 --out - | jq -c 'select(.type == "chat")'
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from services.chat_export import EXPORT_CHUNK_SIZE, export_stream
+
+logger = logging.getLogger("export_chats")
+
+
+def write_export(out, user_id: int | None, compress: bool, chunk_size: int) -> int:
+    written = 0
+    for chunk in export_stream(user_id, compress=compress, chunk_size=chunk_size):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help='output file ("-" for stdout)')
+    parser.add_argument("--user-id", type=int, default=None, help="only this user's chats")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows fetched per round trip")
+    parser.add_argument("--gzip", action="store_true", help="compress (implied by a .gz --out)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    compress = args.gzip or args.out.endswith(".gz")
+    started = time.perf_counter()
+
+    if args.out == "-":
+        written = write_export(sys.stdout.buffer, args.user_id, compress, args.chunk_size)
+    else:
+        # write-then-rename so an interrupted export never looks complete
+        tmp = f"{args.out}.tmp"
+        with open(tmp, "wb") as f:
+            written = write_export(f, args.user_id, compress, args.chunk_size)
+        os.replace(tmp, args.out)
+
+    logger.info("Wrote %d bytes in %.1fs", written, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
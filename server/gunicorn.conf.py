@@ -0,0 +1,42 @@
+# gunicorn.conf.py — preforked multi-worker serving with shared model weights
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# The master imports the app and loads all model weights once, then forks the
+# uvicorn workers. Tensor storage is never written after load, so the workers
+# share those pages copy-on-write instead of each holding its own copy.
+# (Plain `uvicorn --workers N` spawns fresh interpreters and loads N copies.)
+import gc
+import itertools
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def when_ready(server):
+    from services.model_warmup import preload_weights
+
+    preload_weights()
+    # move everything allocated so far out of GC tracking: collections in the
+    # workers would otherwise touch (and un-share) the parent's object pages
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # stable slot per live worker (a respawned worker takes over the free one) for CPU pinning
+    used = {getattr(w, "inference_index", None) for w in server.WORKERS.values()}
+    worker.inference_index = next(i for i in itertools.count() if i not in used)
+
+
+def post_fork(server, worker):
+    # pooled DB connections opened in the master must not be reused across processes
+    from db import engine
+
+    engine.dispose(close=False)
+    # read by services/thread_plan.py when the worker starts (cfg.workers includes a `-w N` override)
+    os.environ["INFERENCE_WORKER_INDEX"] = str(worker.inference_index)
+    os.environ["INFERENCE_WORKER_COUNT"] = str(server.cfg.workers)
@@ -1,9 +1,51 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth_router, chat_router, save_chat_router
-from db import Base, engine
+from fastapi.responses import JSONResponse
+from routers import auth_router, chat_router, metrics_router, save_chat_router
+from db import Base, SessionLocal, engine
+from migrations import run_migrations
+from services.executor import shutdown_executor
+from services.idempotency import prune_keys
+from services.metrics import TracingMiddleware, instrument_engine
+from services.llm_service import close_clients
+from services.password_hashing import shutdown_hash_pool
+from services.model_warmup import PRELOAD_MODELS, model_status, models_ready, warm_up_models
+from services.summary_jobs import start_workers, stop_workers
+from services.thread_plan import apply_thread_plan
 
-app = FastAPI()
+logging.basicConfig(level=logging.INFO)
+
+
+def _prune_idempotency_keys():
+    db = SessionLocal()
+    try:
+        prune_keys(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # size torch's thread pools for this worker before any model runs
+    apply_thread_plan()
+    await asyncio.to_thread(_prune_idempotency_keys)
+    # warm models in the background: /healthz answers right away, /readyz flips once loaded
+    warmup = asyncio.create_task(warm_up_models()) if PRELOAD_MODELS else None
+    await start_workers()
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await stop_workers()
+    # release pooled LLM connections and the inference pool on shutdown
+    await close_clients()
+    shutdown_executor()
+    shutdown_hash_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS for frontend (React runs on port 5173 by default with Vite)
 app.add_middleware(
@@ -17,5 +59,28 @@ app.add_middleware(
 app.include_router(chat_router.router, prefix="/api")
 app.include_router(auth_router.router, prefix="/auth")
 app.include_router(save_chat_router.router)
+app.include_router(metrics_router.router)
+
+# per-stage histograms, DB timings and optional per-request trace logs (/metrics)
+app.add_middleware(TracingMiddleware)
+instrument_engine(engine)
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+
+# ---------------------------
+# Health checks (load balancer)
+# ---------------------------
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    ready = models_ready() or not PRELOAD_MODELS
+    return JSONResponse(
+        {"ready": ready, "models": model_status},
+        status_code=200 if ready else 503,
+    )
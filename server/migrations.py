@@ -0,0 +1,62 @@
+# migrations.py — small forward-only schema migrations
+#
+# `Base.metadata.create_all` creates missing tables but never alters existing
+# ones, so changes to tables that already exist in deployed databases go here.
+# Each step runs once; the applied version is kept in the `schema_version` table.
+
+import logging
+from sqlalchemy import inspect, text
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(table: str, column: str, ddl: str):
+    """
+    Step that adds a column unless it exists already (fresh databases get it from create_all).
+    """
+    def step(conn):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+# (version, description, steps) — a step is a SQL string or a callable taking the connection
+MIGRATIONS = [
+    (1, "indexes for chat list and message history", [
+        "CREATE INDEX IF NOT EXISTS ix_chats_user_id_created_at ON chats (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_chat_id_created_at ON messages (chat_id, created_at)",
+    ]),
+    (2, "per-message emotion scores", [
+        add_column("messages", "emotion_scores", "TEXT"),
+    ]),
+    (3, "summary fingerprints", [
+        add_column("chat_summaries", "source_last_message_id", "INTEGER"),
+        add_column("chat_summaries", "source_message_count", "INTEGER"),
+        add_column("chat_summaries", "source_hash", "VARCHAR"),
+        add_column("summary_jobs", "last_message_id", "INTEGER"),
+    ]),
+]
+
+
+def current_version(conn) -> int:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def run_migrations(bind=engine):
+    with bind.begin() as conn:
+        version = current_version(conn)
+        pending = [m for m in MIGRATIONS if m[0] > version]
+        for step, description, statements in pending:
+            logger.info("Applying migration %s: %s", step, description)
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": step})
+        if pending and bind.dialect.name == "sqlite":
+            # refresh planner statistics so the new indexes are actually picked
+            conn.execute(text("ANALYZE"))
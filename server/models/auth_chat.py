@@ -1,6 +1,6 @@
 # models/auth_chat.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -27,6 +27,11 @@ class Chat(Base):
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
     summary = relationship("ChatSummary", back_populates="chat", uselist=False, cascade="all, delete-orphan")
+    summary_jobs = relationship("SummaryJob", back_populates="chat", cascade="all, delete-orphan")
+    emotion_stats = relationship("ChatEmotion", back_populates="chat", uselist=False, cascade="all, delete-orphan")
+
+    # chat list: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (Index("ix_chats_user_id_created_at", "user_id", "created_at"),)
 
 
 class Message(Base):
@@ -37,11 +42,15 @@ class Message(Base):
     role = Column(String, nullable=False)    
     content_ar = Column(Text, nullable=True)  
     content_en = Column(Text, nullable=True) 
+    emotion_scores = Column(Text, nullable=True)   # JSON list of % scores in emotion_labels order (user messages)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # relation back
     chat = relationship("Chat", back_populates="messages")
 
+    # history / pagination: WHERE chat_id = ? ORDER BY created_at (also serves chat_id-only lookups)
+    __table_args__ = (Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),)
+
 
 class ChatSummary(Base):
     __tablename__ = "chat_summaries"
@@ -53,5 +62,69 @@ class ChatSummary(Base):
     dominant_emotion = Column(String, nullable=True)   # المشاعر الغالبة
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # fingerprint of the messages the summary was built from (skip re-summarizing unchanged chats)
+    source_last_message_id = Column(Integer, nullable=True)
+    source_message_count = Column(Integer, nullable=True)
+    source_hash = Column(String, nullable=True)
+
     # relation back
     chat = relationship("Chat", back_populates="summary")
+
+
+class ChatRequestKey(Base):
+    """
+    Idempotency record of one /api/chat turn: a client retry with the same
+    Idempotency-Key gets the stored response instead of a second LLM call.
+    """
+    __tablename__ = "chat_request_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="in_progress")   # in_progress | done
+    response = Column(Text, nullable=True)                          # JSON body of the finished turn
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")   # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    run_after = Column(DateTime, default=datetime.utcnow)        # retry backoff
+    last_message_id = Column(Integer, nullable=True)             # newest message when (re)requested
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # relation back
+    chat = relationship("Chat", back_populates="summary_jobs")
+
+    __table_args__ = (
+        # workers poll: WHERE status = 'queued' AND run_after <= now
+        Index("ix_summary_jobs_status_run_after", "status", "run_after"),
+        # idempotency: at most one queued job per chat
+        Index(
+            "ux_summary_jobs_queued_chat", "chat_id", unique=True,
+            sqlite_where=text("status = 'queued'"), postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+
+class ChatEmotion(Base):
+    """Running per-chat sum of user-message emotion scores (updated as messages arrive)."""
+    __tablename__ = "chat_emotions"
+
+    chat_id = Column(Integer, ForeignKey("chats.id"), primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    anger = Column(Float, nullable=False, default=0.0)
+    disgust = Column(Float, nullable=False, default=0.0)
+    fear = Column(Float, nullable=False, default=0.0)
+    joy = Column(Float, nullable=False, default=0.0)
+    neutral = Column(Float, nullable=False, default=0.0)
+    sadness = Column(Float, nullable=False, default=0.0)
+    surprise = Column(Float, nullable=False, default=0.0)
+
+    # relation back
+    chat = relationship("Chat", back_populates="emotion_stats")
@@ -13,3 +13,4 @@ class ChatResponse(BaseModel):
     response: str
     emotion: Dict[str, float]   # emotion classification scores
     chat_id: int
+    timings: Optional[Dict[str, float]] = None   # per-stage latency (ms)
@@ -1,17 +1,22 @@
 # auth_router.py (routes + auth utils + dependency)
 
+import math
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from db import get_db
 from models.auth_chat import User
 from schemas.user import UserCreate, UserLogin, UserOut, Token
+from services.auth_cache import AUTH_TRUST_TOKEN_CLAIMS, AuthUser, token_cache, user_cache
+from services.password_hashing import HashPoolBusy, ahash_password, averify_password
+from services.rate_limit import login_ip_limiter, login_user_limiter
 
 # ---------------------------
 # Config
@@ -23,18 +28,10 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 160
 # ---------------------------
 # Crypto / JWT helpers
 # ---------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on a dedicated process pool (services/password_hashing.py)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -42,9 +39,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
+def _verify_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing the result for repeat requests with the same token.
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub = payload.get("sub")
@@ -53,16 +55,39 @@ def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials",
             )
-        user_id = int(sub)
+        claims = {
+            "user_id": int(sub),
+            "username": payload.get("username"),
+            "email": payload.get("email"),
+        }
     except (JWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # never keep a token cached past its own expiry
+    exp = payload.get("exp")
+    token_cache.put(token, claims, ttl=exp - time.time() if exp else None)
+    return claims
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> AuthUser:
+    claims = _verify_token(token)
+    user_id = claims["user_id"]
+
+    if AUTH_TRUST_TOKEN_CLAIMS and claims["username"] and claims["email"]:
+        return AuthUser(id=user_id, username=claims["username"], email=claims["email"])
+
+    user = user_cache.get(user_id)
     if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        row = db.query(User.id, User.username, User.email).filter(User.id == user_id).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user = AuthUser(id=row.id, username=row.username, email=row.email)
+        user_cache.put(user_id, user)
     return user
 
 
@@ -72,17 +97,38 @@ def get_current_user(
 router = APIRouter()
 
 
-@router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+def _check_login_rate(request: Request, username: str):
+    # request.client is the direct peer; behind a proxy run uvicorn with --proxy-headers
+    ip = request.client.host if request.client else "unknown"
+    wait = login_ip_limiter.check(ip) or login_user_limiter.check(username.lower())
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def _hash_pool_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _check_registration(db: Session, user: UserCreate):
     if db.query(User).filter(User.email == user.email).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     if db.query(User).filter(User.username == user.username).first():
         raise HTTPException(status_code=400, detail="Username already taken")
 
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
     new_user = User(
         username=user.username,
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=hashed_password,
     )
     db.add(new_user)
     db.commit()
@@ -90,19 +136,40 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 
+def _get_user_by_username(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+
+@router.post("/register", response_model=UserOut)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    await run_in_threadpool(_check_registration, db, user)
+    try:
+        hashed_password = await ahash_password(user.password)
+    except HashPoolBusy:
+        raise _hash_pool_busy()
+    return await run_in_threadpool(_create_user, db, user, hashed_password)
+
+
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
+    _check_login_rate(request, user.username)
+
+    db_user = await run_in_threadpool(_get_user_by_username, db, user.username)
+    try:
+        valid = db_user is not None and await averify_password(user.password, db_user.hashed_password)
+    except HashPoolBusy:
+        raise _hash_pool_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     token = create_access_token(
-        data={"sub": str(db_user.id)}, expires_delta=access_token_expires
+        data={"sub": str(db_user.id), "username": db_user.username, "email": db_user.email},
+        expires_delta=access_token_expires,
     )
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserOut)
-def read_me(current_user: User = Depends(get_current_user)):
+def read_me(current_user: AuthUser = Depends(get_current_user)):
     return current_user
@@ -1,69 +1,414 @@
 # routers/chat_router.py
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models.auth_chat import User, Chat, Message
+from models.auth_chat import Chat, Message
 from models.schemas import ChatResponse, ChatRequest
 from services.emotion_classifier import emotion_pipeline
-from services.llm_service import get_llm_response
-from services.translataion import translate_ar_to_en, translate_en_to_ar
+from services.executor import run_inference
+from services.timing import StageTimer
+from services.admission import AdmissionRejected, chat_admission
+from services.idempotency import MAX_KEY_LENGTH, RequestInProgress, claim_key, complete_key, release_key
+from services.summary_jobs import maybe_enqueue_auto_summary, notify_workers
+from services.emotion_stats import encode_scores, add_to_aggregate
+from services.llm_service import aget_llm_response, astream_llm_response
+from services.sentences import SentenceStream
+from services.conversation_context import (
+    CONTEXT_RECENT_MESSAGES, ConversationContext, context_store, schedule_fold
+)
+from services.translataion import atranslate_ar_to_en, atranslate_en_to_ar
 from routers.auth_router import get_current_user
-from db import get_db
+from services.auth_cache import AuthUser
+from db import get_db, SessionLocal
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_with_llm(
-    req: ChatRequest,   # 🔹 chat_id + message
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # 1️⃣ ترجم الرسالة
-    text_en = translate_ar_to_en(req.message)
 
-    # 2️⃣ إما جلب المحادثة أو إنشاء جديدة
+# ---------------------------
+# DB helpers (blocking — always called through run_in_threadpool)
+# ---------------------------
+def _get_or_create_chat(db: Session, user_id: int, chat_id: int | None) -> Chat:
     chat = None
-    if req.chat_id:
+    if chat_id:
         chat = db.query(Chat).filter(
-            Chat.id == req.chat_id,
-            Chat.user_id == current_user.id
+            Chat.id == chat_id,
+            Chat.user_id == user_id
         ).first()
 
     if not chat:
-        chat = Chat(user_id=current_user.id)
+        chat = Chat(user_id=user_id)
         db.add(chat)
         db.commit()
         db.refresh(chat)
+    return chat
+
+
+def _add_message(db: Session, chat_id: int, role: str, content_ar: str, content_en: str) -> Message:
+    msg = Message(chat_id=chat_id, role=role, content_ar=content_ar, content_en=content_en)
+    db.add(msg)
+    db.commit()
+    return msg
+
 
-    # 3️⃣ خزّن رسالة المستخدم
-    user_msg = Message(chat_id=chat.id, role="user", content_ar=req.message, content_en=text_en)
-    db.add(user_msg)
+def _store_user_message(db: Session, chat_id: int, content_ar: str, content_en: str, emotions: dict) -> Message:
+    scores = emotions.get("emotion_scores") if "error" not in emotions else None
+    msg = Message(
+        chat_id=chat_id, role="user", content_ar=content_ar, content_en=content_en,
+        emotion_scores=encode_scores(scores) if scores else None,
+    )
+    db.add(msg)
+    if scores:
+        add_to_aggregate(db, chat_id, scores)
     db.commit()
+    return msg
+
+
+def _to_context_message(msg: Message) -> dict:
+    return {"role": msg.role, "content": msg.content_en}
+
+
+def _load_history(db: Session, user_id: int, chat_id: int | None) -> ConversationContext:
+    """
+    Resolve the chat and return its cached context, reloaded when the chat's
+    messages changed behind it (a turn served by another worker). On a
+    reload only the most recent messages are read; older ones are folded in
+    the background.
+    """
+    chat = _get_or_create_chat(db, user_id, chat_id)
+    last_message_id, message_count = db.query(func.max(Message.id), func.count(Message.id)).filter(
+        Message.chat_id == chat.id
+    ).one()
+    ctx = context_store.get(chat.id)
+    if ctx is not None:
+        if ctx.matches(last_message_id, message_count):
+            return ctx
+        context_store.discard(chat.id)
+
+    rows = (
+        db.query(Message)
+        .filter(Message.chat_id == chat.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(CONTEXT_RECENT_MESSAGES + 1)
+        .all()
+    )
+    rows.reverse()
+    older_before_id = None
+    if len(rows) > CONTEXT_RECENT_MESSAGES:
+        rows = rows[1:]
+        older_before_id = rows[0].id
+    return context_store.put(ConversationContext(
+        chat.id, [_to_context_message(m) for m in rows if m.content_en], older_before_id=older_before_id,
+        last_message_id=last_message_id, message_count=message_count,
+    ))
+
+
+def _load_older_messages(chat_id: int, before_id: int) -> list[dict]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Message)
+            .filter(Message.chat_id == chat_id, Message.id < before_id)
+            .order_by(Message.created_at, Message.id)
+            .all()
+        )
+        return [_to_context_message(m) for m in rows if m.content_en]
+    finally:
+        db.close()
+
+
+def _finish_key_new_session(user_id: int, key: str, response: dict | None):
+    # store the finished turn for replays, or free the key if the stream broke off
+    db = SessionLocal()
+    try:
+        if response is not None:
+            complete_key(db, user_id, key, response)
+        else:
+            release_key(db, user_id, key)
+    finally:
+        db.close()
+
+
+async def _aload_older_messages(chat_id: int, before_id: int) -> list[dict]:
+    return await run_in_threadpool(_load_older_messages, chat_id, before_id)
+
+
+def _persist_assistant(db: Session, chat_id: int, content_ar: str, content_en: str) -> int:
+    msg = _add_message(db, chat_id, "assistant", content_ar, content_en)
+    message_id = msg.id
+    # keep sidebar titles fresh: queue a background summary every SUMMARY_AUTO_EVERY messages
+    if maybe_enqueue_auto_summary(db, chat_id):
+        notify_workers()
+    return message_id
+
+
+def _persist_assistant_new_session(chat_id: int, content_ar: str, content_en: str) -> int:
+    # used once a streaming response has outlived the request-scoped session
+    db = SessionLocal()
+    try:
+        return _persist_assistant(db, chat_id, content_ar, content_en)
+    finally:
+        db.close()
+
+
+def _store_user_message_new_session(chat_id: int, content_ar: str, content_en: str, emotions: dict) -> int:
+    # persist_user is a task that can outlive the request-scoped session (a stream awaits it in events())
+    db = SessionLocal()
+    try:
+        return _store_user_message(db, chat_id, content_ar, content_en, emotions).id
+    finally:
+        db.close()
+
+
+async def _store_user_turn(ctx: ConversationContext, content_ar: str, content_en: str, emotions: dict):
+    message_id = await run_in_threadpool(_store_user_message_new_session, ctx.chat_id, content_ar, content_en, emotions)
+    ctx.record_stored(message_id)
+
+
+async def _prepare_turn(req: ChatRequest, user_id: int, db: Session, timer: StageTimer):
+    """
+    Shared first half of the pipeline: translate the user message, load the chat
+    history, classify its emotion and start persisting it (with its scores).
+    """
+    # 1️⃣ ترجم الرسالة + جلب/إنشاء المحادثة وتاريخها (بالتوازي)
+    text_en, ctx = await asyncio.gather(
+        timer.timed("translate_in", atranslate_ar_to_en(req.message)),
+        timer.timed("load_history", run_in_threadpool(_load_history, db, user_id, req.chat_id)),
+    )
+    ctx.append("user", text_en)
+    conversation_en = ctx.messages()
+
+    # 2️⃣ تحليل المشاعر على آخر رسالة
+    emotions = await timer.timed("classify", run_inference(emotion_pipeline, text_en))
+
+    # 3️⃣ خزّن رسالة المستخدم مع درجات المشاعر في الخلفية (يتداخل مع الـ LLM)
+    persist_user = asyncio.create_task(timer.timed(
+        "persist_user", _store_user_turn(ctx, req.message, text_en, emotions)
+    ))
+    return ctx, conversation_en, emotions, persist_user
+
+
+# ---------------------------
+# 🚦 Admission control + idempotency keys
+# ---------------------------
+def _rejected(e: AdmissionRejected) -> HTTPException:
+    detail = "Too many messages in progress, please wait" if e.status_code == 429 else "Server busy, please retry shortly"
+    return HTTPException(status_code=e.status_code, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
 
-    # 4️⃣ استخرج المحادثة كلها بالإنجليزية لإرسالها لـ LLM
-    conversation_en = [
-        {"role": msg.role, "content": msg.content_en}
-        for msg in db.query(Message).filter(Message.chat_id == chat.id).order_by(Message.created_at).all()
-    ]
+async def _claim_idempotency_key(db: Session, user_id: int, key: str | None) -> dict | None:
+    """
+    Stored response of an already finished turn with this key, or None to run it.
+    """
+    if key is None:
+        return None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    try:
+        return await run_in_threadpool(claim_key, db, user_id, key)
+    except RequestInProgress:
+        raise HTTPException(status_code=409, detail="This message is still being processed", headers={"Retry-After": "1"})
 
-    # 5️⃣ تحليل المشاعر على آخر رسالة
-    emotions = emotion_pipeline(text_en)
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_llm(
+    req: ChatRequest,   # 🔹 chat_id + message
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+):
+    # 🔁 client retry of a finished turn: same answer, no second LLM call or Message row
+    stored = await _claim_idempotency_key(db, current_user.id, idempotency_key)
+    if stored is not None:
+        return ChatResponse(**stored)
+
+    try:
+        async with chat_admission.slot(current_user.id):
+            response = await _chat_turn(req, current_user.id, db)
+    except BaseException as e:
+        if idempotency_key:
+            await run_in_threadpool(release_key, db, current_user.id, idempotency_key)
+        if isinstance(e, AdmissionRejected):
+            raise _rejected(e)
+        raise
+
+    if idempotency_key:
+        await run_in_threadpool(complete_key, db, current_user.id, idempotency_key, response.dict())
+    return response
+
+
+async def _chat_turn(req: ChatRequest, user_id: int, db: Session) -> ChatResponse:
+    timer = StageTimer()
+    ctx, conversation_en, emotions, persist_user = await _prepare_turn(req, user_id, db, timer)
+    chat_id = ctx.chat_id
     if "error" in emotions:
-        return ChatResponse(response="❌ خطأ أثناء تحليل المشاعر", emotion={})
+        await persist_user
+        return ChatResponse(response="❌ خطأ أثناء تحليل المشاعر", emotion={}, chat_id=chat_id, timings=timer.summary())
     dom_emotion = emotions["dominant_emotion"]
 
-    # 6️⃣ أرسل للـ LLM
-    llm_result = get_llm_response(conversation_en, dom_emotion)
+    # 4️⃣ أرسل للـ LLM
+    llm_result = await timer.timed("llm", aget_llm_response(conversation_en, dom_emotion))
 
     if llm_result.get("success"):
         llm_response_en = llm_result["response"]
-        llm_response_ar = translate_en_to_ar(llm_response_en)
+        ctx.append("assistant", llm_response_en)
+        llm_response_ar = await timer.timed("translate_out", atranslate_en_to_ar(llm_response_en))
     else:
         llm_response_en = ""
         llm_response_ar = f"❌ خطأ في LLM: {llm_result.get('error', 'غير معروف')}"
 
-    # 7️⃣ خزّن رد البوت
-    bot_msg = Message(chat_id=chat.id, role="assistant", content_ar=llm_response_ar, content_en=llm_response_en)
-    db.add(bot_msg)
-    db.commit()
+    # 5️⃣ خزّن رد البوت (بعد اكتمال حفظ رسالة المستخدم للحفاظ على الترتيب)
+    await persist_user
+    assistant_id = await timer.timed(
+        "persist_assistant",
+        run_in_threadpool(_persist_assistant, db, chat_id, llm_response_ar, llm_response_en),
+    )
+    ctx.record_stored(assistant_id)
+
+    schedule_fold(ctx, _aload_older_messages)
+
+    timings = timer.summary()
+    logger.info("chat %s stage timings (ms): %s", chat_id, timings)
+    return ChatResponse(response=llm_response_ar, emotion=emotions["emotion_scores"], chat_id=chat_id, timings=timings)
+
+
+# ---------------------------
+# 🌊 Streaming variant (SSE)
+# ---------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_llm_sentences(conversation_en: list[dict], dom_emotion: str, queue: asyncio.Queue):
+    """
+    Producer: read the LLM stream, cut it into sentences and queue one
+    EN→AR translation task per sentence (in order). `None` marks the end.
+    """
+    sentences = SentenceStream()
+    try:
+        async for delta in astream_llm_response(conversation_en, dom_emotion):
+            for sentence in sentences.feed(delta):
+                await queue.put((sentence, asyncio.create_task(atranslate_en_to_ar(sentence))))
+        for sentence in sentences.flush():
+            await queue.put((sentence, asyncio.create_task(atranslate_en_to_ar(sentence))))
+    finally:
+        await queue.put(None)
+
+
+class _GuardedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that awaits `on_close` however the response ends:
+    finished, client gone, or failed before the body was ever iterated
+    (a generator's own `finally` only runs once it has started).
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+async def _replay_stream(stored: dict):
+    # a retried stream whose turn already finished: replay it as one chunk
+    yield _sse("meta", {"chat_id": stored["chat_id"], "emotion": stored["emotion"]})
+    yield _sse("chunk", {"text": stored["response"]})
+    yield _sse("done", {"chat_id": stored["chat_id"], "response": stored["response"], "timings": stored.get("timings")})
+
+
+@router.post("/chat/stream")
+async def chat_with_llm_stream(
+    req: ChatRequest,
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+):
+    user_id = current_user.id
+    stored = await _claim_idempotency_key(db, user_id, idempotency_key)
+    if stored is not None:
+        return StreamingResponse(_replay_stream(stored), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    # the admission slot is held until the stream ends, not just until the handler returns
+    try:
+        release_slot = await chat_admission.acquire(user_id)
+    except AdmissionRejected as e:
+        if idempotency_key:
+            await run_in_threadpool(release_key, db, user_id, idempotency_key)
+        raise _rejected(e)
+
+    try:
+        timer = StageTimer()
+        ctx, conversation_en, emotions, persist_user = await _prepare_turn(req, user_id, db, timer)
+    except BaseException:
+        release_slot()
+        if idempotency_key:
+            await run_in_threadpool(release_key, db, user_id, idempotency_key)
+        raise
+    chat_id = ctx.chat_id
+
+    completed = None   # the finished turn, stored for idempotent replays
+
+    async def finish():
+        release_slot()
+        if idempotency_key:
+            await run_in_threadpool(_finish_key_new_session, user_id, idempotency_key, completed)
+
+    async def events():
+        nonlocal completed
+        if "error" in emotions:
+            await persist_user
+            error = "❌ خطأ أثناء تحليل المشاعر"
+            completed = {"response": error, "emotion": {}, "chat_id": chat_id, "timings": timer.summary()}
+            yield _sse("error", {"chat_id": chat_id, "error": error})
+            return
+
+        yield _sse("meta", {"chat_id": chat_id, "emotion": emotions["emotion_scores"]})
+
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(_stream_llm_sentences(conversation_en, emotions["dominant_emotion"], queue))
+        parts_en, parts_ar = [], []
+        try:
+            while (item := await queue.get()) is not None:
+                sentence_en, translation = item
+                sentence_ar = await translation
+                if "first_sentence" not in timer.timings:
+                    timer.timings["first_sentence"] = timer.summary()["total"]
+                parts_en.append(sentence_en)
+                parts_ar.append(sentence_ar)
+                yield _sse("chunk", {"text": sentence_ar})
+            await producer   # re-raise LLM errors
+            response_en, response_ar = " ".join(parts_en), " ".join(parts_ar)
+            ctx.append("assistant", response_en)
+        except Exception as e:
+            response_en = ""
+            response_ar = f"❌ خطأ في LLM: {e}"
+            yield _sse("error", {"chat_id": chat_id, "error": response_ar})
+        finally:
+            producer.cancel()
+
+        # 💾 الرسالة النهائية تُخزَّن مرة واحدة عند انتهاء البث
+        await persist_user
+        assistant_id = await timer.timed(
+            "persist_assistant",
+            run_in_threadpool(_persist_assistant_new_session, chat_id, response_ar, response_en),
+        )
+        ctx.record_stored(assistant_id)
+        schedule_fold(ctx, _aload_older_messages)
+
+        timings = timer.summary()
+        logger.info("chat %s stream stage timings (ms): %s", chat_id, timings)
+        completed = {"response": response_ar, "emotion": emotions["emotion_scores"], "chat_id": chat_id, "timings": timings}
+        yield _sse("done", {"chat_id": chat_id, "response": response_ar, "timings": timings})
 
-    return ChatResponse(response=llm_response_ar, emotion=emotions["emotion_scores"],chat_id=chat.id )
+    return _GuardedStreamingResponse(events(), finish, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
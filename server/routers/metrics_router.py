@@ -0,0 +1,110 @@
+# metrics_router.py — Prometheus text exposition of the app's histograms, counters and queue/cache gauges
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.admission import chat_admission
+from services.auth_cache import auth_cache_stats
+from services.conversation_context import context_store
+from services.executor import inference_executor
+from services.llm_service import llm_stats
+from services.metrics import register_collector, render_metrics
+from services.password_hashing import hash_pool_stats
+from services.summary_jobs import summary_job_counts
+from services.thread_plan import thread_plan_stats
+from services.translataion import translation_stats
+
+router = APIRouter()
+
+
+@register_collector
+def _translation_metrics():
+    stats = translation_stats()
+    directions = [({"direction": name}, s) for name, s in stats.items()]
+    return [
+        ("translation_batcher_pending", "gauge", "Segments waiting for a translation batch",
+         [(labels, s["pending"]) for labels, s in directions]),
+        ("translation_batches_total", "counter", "Translation batches run",
+         [(labels, s["batches"]) for labels, s in directions]),
+        ("translation_batch_fill_ratio", "gauge", "Average batch fill ratio",
+         [(labels, s["avg_fill_ratio"]) for labels, s in directions]),
+        ("translation_cache_hits_total", "counter", "Translation cache hits (memory + disk)",
+         [(labels, s["cache"]["hits"] + s["cache"]["disk_hits"]) for labels, s in directions]),
+        ("translation_cache_misses_total", "counter", "Translation cache misses",
+         [(labels, s["cache"]["misses"]) for labels, s in directions]),
+        ("translation_cache_entries", "gauge", "Entries in the translation cache",
+         [(labels, s["cache"]["entries"]) for labels, s in directions]),
+        ("translation_beam_ms_per_token", "gauge", "Moving average of beam-search cost per source token",
+         [(labels, s["decoding"]["beam_ms_per_token"]) for labels, s in directions
+          if s["decoding"]["beam_ms_per_token"] is not None]),
+    ]
+
+
+@register_collector
+def _llm_metrics():
+    stats = llm_stats()
+    return [
+        ("llm_retries_total", "counter", "LLM request retries", [({}, stats["retries"])]),
+        ("llm_errors_total", "counter", "LLM requests that failed after retries", [({}, stats["errors"])]),
+        ("llm_circuit_open", "gauge", "1 while the LLM circuit breaker is not closed",
+         [({}, int(stats["circuit"]["state"] != "closed"))]),
+        ("llm_circuit_trips_total", "counter", "Times the LLM circuit breaker opened",
+         [({}, stats["circuit"]["trips"])]),
+    ]
+
+
+@register_collector
+def _queue_metrics():
+    hashing = hash_pool_stats()
+    jobs = summary_job_counts()
+    return [
+        # ThreadPoolExecutor keeps its backlog in a private queue
+        ("inference_queue_depth", "gauge", "Model calls waiting for an inference thread",
+         [({}, inference_executor._work_queue.qsize())]),
+        ("password_hash_pending", "gauge", "Password hash/verify calls in flight or queued",
+         [({}, hashing["pending"])]),
+        ("summary_jobs", "gauge", "Summary jobs by status",
+         [({"status": status}, jobs.get(status, 0)) for status in ("queued", "running", "done", "failed")]),
+        ("context_store_entries", "gauge", "Conversation contexts held in memory", [({}, len(context_store))]),
+    ]
+
+
+@register_collector
+def _admission_metrics():
+    stats = chat_admission.stats()
+    return [
+        ("chat_in_flight", "gauge", "Chat turns running in the pipeline", [({}, stats["in_flight"])]),
+        ("chat_queue_depth", "gauge", "Chat turns waiting for admission", [({}, stats["queued"])]),
+        ("chat_admitted_total", "counter", "Chat turns admitted", [({}, stats["admitted"])]),
+        ("chat_rejected_total", "counter", "Chat turns shed by admission control",
+         [({"reason": reason}, count) for reason, count in sorted(stats["rejected"].items())]),
+        ("chat_service_seconds_estimate", "gauge", "Moving average of a chat turn's duration",
+         [({}, stats["service_s"])]),
+    ]
+
+
+@register_collector
+def _auth_metrics():
+    stats = auth_cache_stats()
+    caches = [({"cache": name}, stats[name]) for name in ("tokens", "users")]
+    return [
+        ("auth_cache_hits_total", "counter", "Auth cache hits", [(labels, s["hits"]) for labels, s in caches]),
+        ("auth_cache_misses_total", "counter", "Auth cache misses", [(labels, s["misses"]) for labels, s in caches]),
+    ]
+
+
+@register_collector
+def _thread_plan_metrics():
+    plan = thread_plan_stats()
+    if plan is None:
+        return []
+    return [
+        ("inference_worker_cpus", "gauge", "CPU cores planned for this worker's model calls", [({}, plan["cpus"])]),
+        ("inference_intra_op_threads", "gauge", "torch intra-op threads per model call", [({}, plan["intra_op"])]),
+    ]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
@@ -1,16 +1,22 @@
 # routers/chat_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from models.auth_chat import Chat, Message, ChatSummary, User
+from models.auth_chat import Chat, Message, ChatSummary, SummaryJob
 from routers.auth_router import get_current_user
-from services.llm_service import get_llm_summary
-from services.emotion_classifier import emotion_pipeline
-from services.translataion import translate_ar_to_en, translate_en_to_ar
+from services.auth_cache import AuthUser
+from services.conversation_context import context_store
+from services.pagination import encode_cursor, decode_cursor, before
+from services.summary_jobs import enqueue_summary, notify_workers
+from services.summarizer import get_fresh_summary
+from services.emotion_stats import chat_emotion_averages, emotion_timeline
+from services.chat_export import export_stream
 from db import get_db
 from pydantic import BaseModel
-from typing import List
-import re
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter()
 
@@ -29,9 +35,9 @@ class ConversationPayload(BaseModel):
 # 🗑️ حذف جلسة
 # ---------------------------
 @router.delete("/chats/{chat_id}")
-async def delete_chat(
+def delete_chat(
     chat_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     chat = db.query(Chat).filter(
@@ -44,18 +50,32 @@ async def delete_chat(
 
     db.delete(chat)
     db.commit()
+    context_store.discard(chat_id)
     return {"message": "✅ Chat deleted successfully"}
 
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # ---------------------------
-# 📥 جلب الرسائل داخل جلسة محددة
+# 📥 جلب الرسائل داخل جلسة محددة (keyset pagination: الأحدث أولاً، صفحة بعد صفحة للأقدم)
 # ---------------------------
 @router.get("/chats/{chat_id}/messages")
-async def get_chat_messages(
+def get_chat_messages(
     chat_id: int,
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,          # next_cursor of the previous page (older messages)
+    include_total: bool = False,
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    chat = db.query(Chat).filter(
+    keyset = _parse_cursor(cursor)
+    chat = db.query(Chat.id).filter(
         Chat.id == chat_id,
         Chat.user_id == current_user.id
     ).first()
@@ -63,172 +83,212 @@ async def get_chat_messages(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    messages = db.query(Message).filter(
-        Message.chat_id == chat.id
-    ).order_by(Message.created_at.asc()).all()
+    query = db.query(Message.id, Message.role, Message.content_ar, Message.created_at).filter(
+        Message.chat_id == chat_id
+    )
+    if keyset:
+        query = query.filter(before(Message.created_at, Message.id, keyset))
+    rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
 
-    return [
-        {
-            "id": m.id,
-            "sender": m.role,
-            "text": m.content_ar,   # أو content_en حسب اللغة
-            "created_at": m.created_at
-        }
-        for m in messages
-    ]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1] if rows else None
+    rows.reverse()   # page is returned oldest → newest for display
+
+    return {
+        "items": [
+            {
+                "id": m.id,
+                "sender": m.role,
+                "text": m.content_ar,   # أو content_en حسب اللغة
+                "created_at": m.created_at
+            }
+            for m in rows
+        ],
+        "next_cursor": encode_cursor(last.created_at, last.id) if has_more else None,
+        "total": db.query(Message).filter(Message.chat_id == chat_id).count() if include_total else None,
+    }
 
 # ---------------------------
-# 📜 جلب جميع الجلسات (ID, User, Created_at)
+# 📈 تطوّر المشاعر داخل جلسة (درجات كل رسالة + المتوسط التراكمي)
+# ---------------------------
+@router.get("/chats/{chat_id}/emotions")
+def get_chat_emotions(
+    chat_id: int,
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    chat = db.query(Chat.id).filter(
+        Chat.id == chat_id,
+        Chat.user_id == current_user.id
+    ).first()
+
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    averages = chat_emotion_averages(db, chat_id)
+    return {
+        "chat_id": chat_id,
+        "dominant_emotion": next(iter(averages)) if averages else None,
+        "average_scores": averages or {},
+        "timeline": emotion_timeline(db, chat_id),
+    }
+
+# ---------------------------
+# 📜 جلب الجلسات مع ملخصاتها (keyset pagination: الأحدث أولاً)
 # ---------------------------
 @router.get("/chats")
-async def get_chats(
-    current_user: User = Depends(get_current_user),
+def get_chats(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,          # next_cursor of the previous page
+    include_total: bool = False,
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    chats = (
-        db.query(Chat)
+    keyset = _parse_cursor(cursor)
+
+    # one query: only the columns the sidebar needs, summary joined in (no lazy load per chat)
+    query = (
+        db.query(
+            Chat.id,
+            Chat.created_at,
+            ChatSummary.title,
+            ChatSummary.summary,
+            ChatSummary.dominant_emotion,
+            ChatSummary.created_at.label("summary_created_at"),
+        )
+        .outerjoin(ChatSummary, ChatSummary.chat_id == Chat.id)
         .filter(Chat.user_id == current_user.id)
-        .outerjoin(ChatSummary)  # join summaries
-        .all()
     )
+    if keyset:
+        query = query.filter(before(Chat.created_at, Chat.id, keyset))
+    rows = query.order_by(Chat.created_at.desc(), Chat.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-    return [
-        {
-            "id": c.id,
-            "created_at": c.created_at,
-            "summary": {
-                "id": c.summary.id if c.summary else None,
-                "title": c.summary.title if c.summary else None,
-                "summary": c.summary.summary if c.summary else None,
-                "dominant_emotion": c.summary.dominant_emotion if c.summary else None,
-                "created_at": c.summary.created_at if c.summary else None,
+    return {
+        "items": [
+            {
+                "id": c.id,
+                "created_at": c.created_at,
+                "summary": {
+                    "title": c.title,
+                    "summary": c.summary,
+                    "dominant_emotion": c.dominant_emotion,
+                    "created_at": c.summary_created_at,
+                }
             }
-        }
-        for c in chats
-    ]
+            for c in rows
+        ],
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        "total": db.query(Chat).filter(Chat.user_id == current_user.id).count() if include_total else None,
+    }
+
+# ---------------------------
+# 📦 تصدير كل محادثات المستخدم (NDJSON متدفق، اختيارياً مضغوط gzip)
+# ---------------------------
+@router.get("/chats/export")
+def export_chats(
+    gzip: bool = False,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    # streamed row chunks on the export's own session: memory stays flat however large the archive
+    filename = f"chats-{current_user.id}-{datetime.utcnow():%Y%m%d}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_stream(current_user.id, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 # ---------------------------
 # 💾 حفظ محادثة وتوليد ملخص
 # ---------------------------
 class SaveChatRequest(BaseModel):
     chat_id: int
-# ✅ Manual mapping for emotions (no bad MT translations)
-EMOTION_MAP = {
-    "anger": "غضب",
-    "disgust": "اشمئزاز",
-    "fear": "خوف",
-    "joy": "فرح",
-    "neutral": "عادي",
-    "sadness": "حزن",
-    "surprise": "مفاجأة"
-}
-
-# ✅ Smarter title translator
-def smart_translate_title(text: str) -> str:
-    if not text or text.lower() in ["untitled", "title"]:
-        return "بدون عنوان"
-    try:
-        result = translate_en_to_ar(text)
-        # Heuristic: if translation looks broken, fallback to English
-        if len(result.split()) < 2 or "مُحَار" in result or result.startswith("❌"):
-            return text
-        return result
-    except Exception:
-        return text or "بدون عنوان"
-
-
-@router.post("/save-conversation")
-async def save_conversation(
-    data: SaveChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _enqueue_owned_chat(db: Session, chat_id: int, user_id: int) -> SummaryJob | ChatSummary:
+    """
+    The chat's stored summary if it is still current, else its summary job (queued or reused).
+    """
     # 🔎 Validate chat ownership
-    chat = db.query(Chat).filter(
-        Chat.id == data.chat_id,
-        Chat.user_id == current_user.id
+    chat = db.query(Chat.id).filter(
+        Chat.id == chat_id,
+        Chat.user_id == user_id
     ).first()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    # 📩 Fetch chat messages
-    messages_db = db.query(Message).filter(
-        Message.chat_id == chat.id
-    ).order_by(Message.created_at.asc()).all()
-    if not messages_db:
+    if not db.query(Message.id).filter(Message.chat_id == chat_id).first():
         raise HTTPException(status_code=400, detail="No messages in chat")
 
-    # 🔄 Prepare English conversation for LLM
-    conversation_en = [
-        {"role": m.role, "content": m.content_en}
-        for m in messages_db if m.content_en
-    ]
+    # ♻️ nothing new since the last summary: no LLM call, no job
+    fresh = get_fresh_summary(db, chat_id)
+    if fresh is not None:
+        return fresh
+    return enqueue_summary(db, chat_id)
 
-    # 🧠 Emotion analysis (on all user messages)
-    user_text = " ".join(
-        [m.content_en for m in messages_db if m.role == "user" and m.content_en]
-    )
-    emotions = emotion_pipeline(user_text)
-    if "error" in emotions:
-        dominant_emotion = "neutral"
-    else:
-        dominant_emotion = emotions.get("dominant_emotion", "neutral")
-
-    # 📋 Summarize with LLM
-    llm_summary = get_llm_summary(conversation_en)
-    if not llm_summary.get("success"):
-        raise HTTPException(status_code=500, detail="❌ LLM summarization failed")
-
-    raw_response = llm_summary.get("response", "")
-    print(raw_response)
-
-    # 📝 Extract Title & Summary safely
-    title_en, summary_en = "Untitled", "❌ No summary generated"
-
-    title_match = re.search(r"Title\s*:\s*(.+)", raw_response)
-    summary_match = re.search(r"Summary\s*:\s*(.+)", raw_response)
-
-    if title_match:
-        title_en = title_match.group(1).strip()
-    if summary_match:
-        summary_en = summary_match.group(1).strip()
-
-    # 🌍 Translate (with fallbacks)
-    def safe_translate(func, text, fallback):
-        try:
-            result = func(text)
-            if result.startswith("❌ Error"):
-                return fallback
-            return result
-        except Exception:
-            return fallback
-
-    title_ar = smart_translate_title(title_en)
-    summary_ar = safe_translate(translate_en_to_ar, summary_en, "❌ لم يتم توليد ملخص")
-    dominant_emotion_ar = EMOTION_MAP.get(dominant_emotion.lower(), "عادي")
-
-    # 💾 Save or update summary
-    chat_summary = db.query(ChatSummary).filter(ChatSummary.chat_id == chat.id).first()
-    if chat_summary:
-        chat_summary.title = title_ar
-        chat_summary.summary = summary_ar
-        chat_summary.dominant_emotion = dominant_emotion_ar
-    else:
-        chat_summary = ChatSummary(
-            chat_id=chat.id,
-            title=title_ar,
-            summary=summary_ar,
-            dominant_emotion=dominant_emotion_ar
-        )
-        db.add(chat_summary)
 
-    db.commit()
+def _summary_result(summary: ChatSummary) -> dict:
+    return {
+        "title": summary.title,
+        "summary": summary.summary,
+        "dominant_emotion": summary.dominant_emotion,
+    }
 
-    # ✅ Return consistent Arabic data
+
+def _job_payload(job: SummaryJob) -> dict:
     return {
-        "message": "✅ Conversation saved and summarized",
-        "chat_id": chat.id,
-        "title": title_ar,
-        "summary": summary_ar,
-        "dominant_emotion": dominant_emotion_ar
+        "job_id": job.id,
+        "chat_id": job.chat_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.last_error,
     }
+
+
+@router.post("/save-conversation", status_code=202)
+async def save_conversation(
+    data: SaveChatRequest,
+    response: Response,
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # summarization runs in the background job queue; poll /summary-jobs/{job_id}
+    job = await run_in_threadpool(_enqueue_owned_chat, db, data.chat_id, current_user.id)
+    if isinstance(job, ChatSummary):
+        response.status_code = 200
+        return {
+            "message": "✅ Conversation already summarized",
+            "job_id": None,
+            "chat_id": job.chat_id,
+            "status": "done",
+            "attempts": 0,
+            "error": None,
+            "result": _summary_result(job),
+        }
+    notify_workers()
+    return {"message": "✅ Conversation queued for summarization", **_job_payload(job)}
+
+
+# ---------------------------
+# 🔄 حالة مهمة التلخيص
+# ---------------------------
+@router.get("/summary-jobs/{job_id}")
+def get_summary_job(
+    job_id: int,
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = (
+        db.query(SummaryJob)
+        .join(Chat, Chat.id == SummaryJob.chat_id)
+        .filter(SummaryJob.id == job_id, Chat.user_id == current_user.id)
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    payload = _job_payload(job)
+    if job.status == "done" and job.chat.summary:
+        payload["result"] = _summary_result(job.chat.summary)
+    return payload
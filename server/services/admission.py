@@ -0,0 +1,146 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque, defaultdict
+from contextlib import asynccontextmanager
+
+# Chat turns allowed in the pipeline at once (per process), per user, and waiting for a slot
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "16"))
+CHAT_MAX_PER_USER = int(os.getenv("CHAT_MAX_PER_USER", "2"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+# A turn must be able to finish within this many seconds of arriving, or it is shed
+CHAT_REQUEST_BUDGET_S = float(os.getenv("CHAT_REQUEST_BUDGET_S", "30"))
+# Starting estimate of one turn's service time (replaced by a moving average)
+CHAT_EXPECTED_SERVICE_S = float(os.getenv("CHAT_EXPECTED_SERVICE_S", "3"))
+
+
+class AdmissionRejected(Exception):
+    """Turn not admitted; `status_code` is 429 (per-user cap) or 503 (overload)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit with a FIFO wait queue, per-user caps and
+    deadline-aware shedding: a turn is refused up front when its estimated
+    queue wait plus service time exceeds the budget, and dropped from the
+    queue once it can no longer finish in time. Event-loop only (not thread-safe).
+    """
+
+    def __init__(self, max_in_flight: int = CHAT_MAX_IN_FLIGHT, max_per_user: int = CHAT_MAX_PER_USER,
+                 max_queue: int = CHAT_MAX_QUEUE, budget_s: float = CHAT_REQUEST_BUDGET_S,
+                 expected_service_s: float = CHAT_EXPECTED_SERVICE_S):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_per_user = max(1, max_per_user)
+        self.max_queue = max(0, max_queue)
+        self.budget_s = budget_s
+        self.service_s = expected_service_s
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._per_user: defaultdict[int, int] = defaultdict(int)
+        self.admitted = 0
+        self.rejected: defaultdict[str, int] = defaultdict(int)
+
+    def _reject(self, status_code: int, reason: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(status_code, reason, retry_after)
+
+    def _estimated_wait(self, position: int) -> float:
+        return position / self.max_in_flight * self.service_s
+
+    async def _acquire(self, user_id: int):
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            self._reject(429, "user_limit", self.service_s)
+
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        position = len(self._waiters) + 1
+        if len(self._waiters) >= self.max_queue:
+            self._reject(503, "queue_full", self._estimated_wait(position))
+        if self._estimated_wait(position) + self.service_s > self.budget_s:
+            self._reject(503, "deadline", self._estimated_wait(position))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._per_user[user_id] += 1   # queued turns count against the user's cap too
+        try:
+            # a slot is handed over by _release; give up once the turn could no longer finish
+            await asyncio.wait_for(waiter, timeout=max(0.0, self.budget_s - self.service_s))
+        except asyncio.TimeoutError:
+            self._reject(503, "timeout", self._estimated_wait(len(self._waiters)))
+        except BaseException:
+            # cancelled (client gone) right after being handed a slot: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._pass_slot()
+            raise
+        finally:
+            self._leave(user_id)
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _leave(self, user_id: int):
+        self._per_user[user_id] -= 1
+        if not self._per_user[user_id]:
+            del self._per_user[user_id]
+
+    def _release(self, duration_s: float):
+        # moving average of service time drives the wait estimates
+        self.service_s = 0.8 * self.service_s + 0.2 * duration_s
+        self._pass_slot()
+
+    def _pass_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)   # slot passes straight to the next waiter
+                return
+        self.in_flight -= 1
+
+    async def acquire(self, user_id: int):
+        """
+        Wait for a slot (or raise AdmissionRejected). Returns the release
+        callable, for turns that outlive the handler (streaming responses).
+        """
+        await self._acquire(user_id)
+        self.admitted += 1
+        self._per_user[user_id] += 1
+        started = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._leave(user_id)
+                self._release(time.perf_counter() - started)
+        return release
+
+    @asynccontextmanager
+    async def slot(self, user_id: int):
+        release = await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_s": round(self.service_s, 3),
+        }
+
+
+chat_admission = AdmissionController()
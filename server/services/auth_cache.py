@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+from models.auth_chat import User
+
+# Verified tokens and user records are reused for up to AUTH_CACHE_TTL seconds
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Build the current user from the signed token claims alone (no DB lookup).
+# A deleted or renamed user keeps working until the token expires.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "0") == "1"
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """
+    Detached snapshot of the authenticated user (safe to share across sessions and threads).
+    """
+    id: int
+    username: str
+    email: str
+
+
+class TTLCache:
+    """
+    Bounded LRU whose entries expire after `ttl` seconds (or an earlier per-entry deadline).
+    """
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl: float = AUTH_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TTLCache()   # raw token -> verified claims
+user_cache = TTLCache()    # user id -> AuthUser
+
+
+def invalidate_user(user_id: int):
+    """
+    Drop a cached user record (this process only; other workers expire it after the TTL).
+    """
+    user_cache.discard(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_user(target.id)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats(), "trust_claims": AUTH_TRUST_TOKEN_CLAIMS}
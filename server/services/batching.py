@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+
+class MicroBatcher:
+    """
+    Collect concurrent single-item requests into small batches.
+
+    Callers submit one item and get back a Future. A background thread waits
+    up to `max_wait_ms` (or until `max_batch_size` items are pending), runs
+    `batch_fn` once on the whole list and fans the results back out.
+    `initializer` runs first thing in that thread (e.g. CPU pinning).
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0, name: str = "batcher",
+                 initializer=None):
+        self.batch_fn = batch_fn
+        self.initializer = initializer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._queue: Queue = Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # counters
+        self._batches = 0
+        self._items = 0
+        self._fill_total = 0.0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+    # --- public API ---
+
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": batches,
+                "items": items,
+                "pending": self._queue.qsize(),
+                "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+                "avg_fill_ratio": round(self._fill_total / batches, 3) if batches else 0.0,
+                "avg_queue_wait_ms": round(self._wait_total_ms / items, 3) if items else 0.0,
+                "max_queue_wait_ms": round(self._wait_max_ms, 3),
+            }
+
+    # --- worker ---
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        # Block for the first item, then keep collecting until the batch
+        # is full or the wait window closes.
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        if self.initializer is not None:
+            self.initializer()
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(batch, started)
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, batch: list, started: float):
+        waits = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._fill_total += len(batch) / self.max_batch_size
+            self._wait_total_ms += sum(waits)
+            self._wait_max_ms = max(self._wait_max_ms, max(waits))
@@ -0,0 +1,133 @@
+import os
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from db import SessionLocal
+from models.auth_chat import Chat, ChatSummary, Message
+from services.emotion_stats import decode_scores
+
+# Rows fetched from the database per round trip, and bytes buffered before a chunk is sent
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+EXPORT_FLUSH_BYTES = int(os.getenv("EXPORT_FLUSH_BYTES", str(64 * 1024)))
+EXPORT_FORMAT_VERSION = 1
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def iter_export_records(db, user_id: int | None = None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    One "chat" record (summary included) followed by its "message" records,
+    for every chat of `user_id` (all users if None). A single outer-joined
+    query streamed `chunk_size` rows at a time, so memory does not grow with
+    the size of the archive.
+    """
+    query = (
+        db.query(
+            Chat.id,
+            Chat.user_id,
+            Chat.created_at,
+            ChatSummary.id.label("summary_id"),
+            ChatSummary.title,
+            ChatSummary.summary,
+            ChatSummary.dominant_emotion,
+            ChatSummary.created_at.label("summary_created_at"),
+            Message.id.label("message_id"),
+            Message.role,
+            Message.content_ar,
+            Message.content_en,
+            Message.emotion_scores,
+            Message.created_at.label("message_created_at"),
+        )
+        .outerjoin(ChatSummary, ChatSummary.chat_id == Chat.id)
+        .outerjoin(Message, Message.chat_id == Chat.id)
+    )
+    if user_id is not None:
+        query = query.filter(Chat.user_id == user_id)
+    query = query.order_by(Chat.user_id, Chat.id, Message.created_at, Message.id).yield_per(chunk_size)
+
+    current_chat = None
+    for row in query:
+        if row.id != current_chat:
+            current_chat = row.id
+            yield {
+                "type": "chat",
+                "id": row.id,
+                "user_id": row.user_id,
+                "created_at": row.created_at,
+                "summary": {
+                    "title": row.title,
+                    "summary": row.summary,
+                    "dominant_emotion": row.dominant_emotion,
+                    "created_at": row.summary_created_at,
+                } if row.summary_id is not None else None,
+            }
+        if row.message_id is None:   # chat without messages
+            continue
+        yield {
+            "type": "message",
+            "id": row.message_id,
+            "chat_id": row.id,
+            "role": row.role,
+            "content_ar": row.content_ar,
+            "content_en": row.content_en,
+            "emotion_scores": decode_scores(row.emotion_scores),
+            "created_at": row.message_created_at,
+        }
+
+
+def ndjson_chunks(records: Iterable[dict], flush_bytes: int = EXPORT_FLUSH_BYTES) -> Iterator[bytes]:
+    """UTF-8 NDJSON, one record per line, grouped into chunks of about `flush_bytes`."""
+    buffer, size = [], 0
+    for record in records:
+        line = (json.dumps(record, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    # wbits=31: gzip container, compressed incrementally as the chunks arrive
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_header(user_id: int | None) -> dict:
+    return {
+        "type": "export",
+        "version": EXPORT_FORMAT_VERSION,
+        "user_id": user_id,
+        "exported_at": datetime.utcnow(),
+    }
+
+
+def export_stream(user_id: int | None = None, compress: bool = False,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    The export as a byte stream on its own session (it outlives the request
+    handler). Blocking: iterate it from a thread, as StreamingResponse does
+    with plain generators.
+    """
+    def records():
+        yield export_header(user_id)
+        db = SessionLocal()
+        try:
+            yield from iter_export_records(db, user_id, chunk_size)
+        finally:
+            db.close()
+
+    chunks = ndjson_chunks(records())
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,188 @@
+import os
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from services.llm_service import aget_llm_summary, parse_summary
+
+logger = logging.getLogger(__name__)
+
+# Token-budget policy: keep the most recent messages verbatim, fold older ones into a rolling summary
+CONTEXT_RECENT_MESSAGES = int(os.getenv("CONTEXT_RECENT_MESSAGES", "12"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; good enough for budgeting
+    return len(text or "") // 4 + 1
+
+
+class ConversationContext:
+    """
+    English LLM context of one chat: a rolling summary of older turns plus
+    the most recent messages verbatim. Appended to incrementally.
+
+    `last_message_id` / `message_count` describe the chat's rows in the DB the
+    context reflects; another worker adding a message makes them stale.
+    """
+
+    def __init__(self, chat_id: int, messages: list[dict] | None = None, summary: str = "", older_before_id: int | None = None,
+                 last_message_id: int | None = None, message_count: int = 0):
+        self.chat_id = chat_id
+        self.last_message_id = last_message_id
+        self.message_count = message_count
+        self.summary = summary
+        self.recent: list[dict] = list(messages or [])
+        # set on a cold load of a long chat: DB messages with id < older_before_id are not folded in yet
+        self.older_before_id = older_before_id
+        self.folding = False
+        self._lock = threading.Lock()
+
+    def append(self, role: str, content_en: str):
+        if not content_en:
+            return
+        with self._lock:
+            self.recent.append({"role": role, "content": content_en})
+
+    def record_stored(self, message_id: int):
+        # a message of this context was written by this worker
+        with self._lock:
+            self.last_message_id = max(self.last_message_id or 0, message_id)
+            self.message_count += 1
+
+    def matches(self, last_message_id: int | None, message_count: int) -> bool:
+        with self._lock:
+            return self.last_message_id == last_message_id and self.message_count == message_count
+
+    def messages(self) -> list[dict]:
+        with self._lock:
+            prefix = [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] if self.summary else []
+            return prefix + list(self.recent)
+
+    def head(self, count: int) -> list[dict]:
+        with self._lock:
+            return list(self.recent[:count])
+
+    def overflow(self) -> int:
+        """
+        Number of leading messages that should be folded into the summary.
+        """
+        with self._lock:
+            count = max(0, len(self.recent) - CONTEXT_RECENT_MESSAGES)
+            budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(self.summary)
+            tokens = sum(estimate_tokens(m["content"]) for m in self.recent[count:])
+            # over budget even inside the window: fold more, but always keep the last two messages
+            while tokens > budget and count < len(self.recent) - 2:
+                tokens -= estimate_tokens(self.recent[count]["content"])
+                count += 1
+            return count
+
+    def apply_fold(self, folded: int, summary: str):
+        with self._lock:
+            del self.recent[:folded]
+            self.summary = summary
+            self.older_before_id = None
+
+
+class ContextStore:
+    """
+    Bounded LRU of ConversationContext objects keyed by chat_id.
+    """
+
+    def __init__(self, max_size: int = CONTEXT_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._items: OrderedDict[int, ConversationContext] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> ConversationContext | None:
+        with self._lock:
+            ctx = self._items.get(chat_id)
+            if ctx is not None:
+                self._items.move_to_end(chat_id)
+            return ctx
+
+    def put(self, ctx: ConversationContext) -> ConversationContext:
+        with self._lock:
+            # keep the first one if two requests loaded the same chat concurrently
+            ctx = self._items.setdefault(ctx.chat_id, ctx)
+            self._items.move_to_end(ctx.chat_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            return ctx
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def discard(self, chat_id: int):
+        with self._lock:
+            self._items.pop(chat_id, None)
+
+
+context_store = ContextStore()
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _next_fold_chunk(messages: list[dict], start: int, summary: str) -> list[dict]:
+    # as many messages from `start` as fit CONTEXT_TOKEN_BUDGET next to the running summary
+    # (at least one, cut down to the budget if it is larger on its own)
+    budget = max(1, CONTEXT_TOKEN_BUDGET - estimate_tokens(summary))
+    chunk, tokens = [], 0
+    for message in messages[start:]:
+        size = estimate_tokens(message["content"])
+        if chunk and tokens + size > budget:
+            break
+        if size > budget:
+            message = {**message, "content": message["content"][:budget * 4]}
+            size = budget
+        chunk.append(message)
+        tokens += size
+    return chunk
+
+
+async def fold_context(ctx: ConversationContext, older_loader=None):
+    """
+    Fold old messages into the rolling summary with the summarization prompt.
+    `older_loader(chat_id, before_id)` is an async callable returning the
+    messages that were never loaded into the context (cold start of a long chat).
+    They are folded in chunks of CONTEXT_TOKEN_BUDGET, each summarized on
+    top of the previous chunk's summary, so no prompt outgrows the LLM's window.
+    """
+    if ctx.folding:
+        return
+    ctx.folding = True
+    try:
+        folded = ctx.overflow()
+        older = []
+        if ctx.older_before_id is not None and older_loader:
+            older = await older_loader(ctx.chat_id, ctx.older_before_id)
+        if not folded and not older:
+            ctx.apply_fold(0, ctx.summary)
+            return
+
+        to_fold = older + ctx.head(folded)
+        summary, done = ctx.summary, 0
+        while done < len(to_fold):
+            chunk = _next_fold_chunk(to_fold, done, summary)
+            previous = [{"role": "system", "content": f"Earlier summary: {summary}"}] if summary else []
+            result = await aget_llm_summary(previous + chunk)
+            if not result.get("success"):
+                logger.warning("context fold for chat %s failed: %s", ctx.chat_id, result.get("error"))
+                return
+            _, chunk_summary = parse_summary(result.get("response", ""))
+            if not chunk_summary:
+                return
+            summary, done = chunk_summary, done + len(chunk)
+
+        ctx.apply_fold(folded, summary)
+    finally:
+        ctx.folding = False
+
+
+def schedule_fold(ctx: ConversationContext, older_loader=None):
+    # runs after the response is sent; never on the request's critical path
+    if not ctx.folding and (ctx.older_before_id is not None or ctx.overflow()):
+        task = asyncio.create_task(fold_context(ctx, older_loader))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
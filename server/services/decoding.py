@@ -0,0 +1,100 @@
+import os
+import math
+import threading
+
+from services.metrics import Counter
+
+# Beam width for mid-length inputs; shorter and longer inputs decode greedily
+DECODE_NUM_BEAMS = int(os.getenv("DECODE_NUM_BEAMS", "4"))
+DECODE_GREEDY_MAX_TOKENS = int(os.getenv("DECODE_GREEDY_MAX_TOKENS", "6"))    # "مرحبا": beams change nothing
+DECODE_BEAM_MAX_TOKENS = int(os.getenv("DECODE_BEAM_MAX_TOKENS", "128"))      # beam cost grows with length
+# Output cap relative to the (longest) source in the batch: ratio * source tokens + slack
+DECODE_LENGTH_RATIO = float(os.getenv("DECODE_LENGTH_RATIO", "1.6"))
+DECODE_LENGTH_SLACK = int(os.getenv("DECODE_LENGTH_SLACK", "10"))
+DECODE_MAX_NEW_TOKENS = int(os.getenv("DECODE_MAX_NEW_TOKENS", "256"))
+# Fall back to greedy when a beam batch is expected to exceed this (queue included); 0 disables
+DECODE_LATENCY_BUDGET_MS = float(os.getenv("DECODE_LATENCY_BUDGET_MS", "0"))
+# Each downgraded batch scales the beam cost estimate by this, so beam search is retried once load drops
+DECODE_ESTIMATE_DECAY = float(os.getenv("DECODE_ESTIMATE_DECAY", "0.9"))
+
+DECODE_BATCHES = Counter("translation_decode_batches_total", "generate() calls by decoding mode", ("direction", "mode"))
+
+
+class DecodingPolicy:
+    """
+    Picks generate() options for one translation batch from its longest
+    source: greedy for very short or very long inputs, beam search (with
+    early stopping) in between, and max_new_tokens bounded by the source
+    length. With a latency budget, beam batches are downgraded to greedy
+    while the moving average of beam cost per source token, scaled by the
+    batcher backlog, says the batch would not fit in the budget. Downgraded
+    batches decay that average, so a later batch probes beam search again.
+    """
+
+    def __init__(self, name: str, num_beams: int = DECODE_NUM_BEAMS,
+                 greedy_max_tokens: int = DECODE_GREEDY_MAX_TOKENS, beam_max_tokens: int = DECODE_BEAM_MAX_TOKENS,
+                 length_ratio: float = DECODE_LENGTH_RATIO, length_slack: int = DECODE_LENGTH_SLACK,
+                 max_new_tokens: int = DECODE_MAX_NEW_TOKENS, latency_budget_ms: float = DECODE_LATENCY_BUDGET_MS,
+                 pending=None, max_batch_size: int = 1, estimate_decay: float = DECODE_ESTIMATE_DECAY):
+        self.name = name
+        self.num_beams = max(1, num_beams)
+        self.greedy_max_tokens = greedy_max_tokens
+        self.beam_max_tokens = beam_max_tokens
+        self.length_ratio = length_ratio
+        self.length_slack = length_slack
+        self.max_new_tokens_cap = max(1, max_new_tokens)
+        self.latency_budget_ms = latency_budget_ms
+        self.pending = pending               # callable: items waiting in the batcher
+        self.max_batch_size = max(1, max_batch_size)
+        self.estimate_decay = min(1.0, max(0.0, estimate_decay))
+        self._beam_ms_per_token: float | None = None
+        self._lock = threading.Lock()
+
+    def max_new_tokens(self, source_tokens: int) -> int:
+        return min(self.max_new_tokens_cap, math.ceil(source_tokens * self.length_ratio) + self.length_slack)
+
+    def _over_budget(self, source_tokens: int) -> bool:
+        if self.latency_budget_ms <= 0 or self._beam_ms_per_token is None:
+            return False
+        backlog = self.pending() / self.max_batch_size if self.pending else 0.0
+        return self._beam_ms_per_token * source_tokens * (1 + backlog) > self.latency_budget_ms
+
+    def choose(self, source_tokens: int) -> tuple[str, dict]:
+        """Returns (mode, generate() kwargs) for a batch whose longest source has `source_tokens` tokens."""
+        if self.num_beams == 1 or not self.greedy_max_tokens < source_tokens <= self.beam_max_tokens:
+            mode = "greedy"
+        elif self._over_budget(source_tokens):
+            mode = "greedy_under_load"
+        else:
+            mode = "beam"
+
+        options = {"max_new_tokens": self.max_new_tokens(source_tokens), "do_sample": False}
+        if mode == "beam":
+            options.update(num_beams=self.num_beams, early_stopping=True)
+        else:
+            options["num_beams"] = 1
+        DECODE_BATCHES.inc(self.name, mode)
+        return mode, options
+
+    def observe(self, mode: str, source_tokens: int, elapsed_s: float):
+        if mode == "greedy_under_load":
+            # no beam cost is measured while downgraded; without decay the downgrade would never end
+            with self._lock:
+                if self._beam_ms_per_token is not None:
+                    self._beam_ms_per_token *= self.estimate_decay
+            return
+        # only beam batches tell us what beam search costs right now
+        if mode != "beam" or source_tokens <= 0:
+            return
+        ms_per_token = elapsed_s * 1000 / source_tokens
+        with self._lock:
+            previous = self._beam_ms_per_token
+            self._beam_ms_per_token = ms_per_token if previous is None else 0.8 * previous + 0.2 * ms_per_token
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "num_beams": self.num_beams,
+                "latency_budget_ms": self.latency_budget_ms,
+                "beam_ms_per_token": round(self._beam_ms_per_token, 3) if self._beam_ms_per_token else None,
+            }
@@ -1,20 +1,25 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
 import torch
 import torch.nn.functional as F
 from functools import lru_cache
+from services.inference_backend import load_classifier
+from services.metrics import traced
 
 # Labels for the emotion model
 emotion_labels = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
 
+EMOTION_MODEL = os.getenv("EMOTION_MODEL", "j-hartmann/emotion-english-distilroberta-base")
+
+# Max texts per forward pass in classify_emotions_batch
+EMOTION_MAX_BATCH_SIZE = int(os.getenv("EMOTION_MAX_BATCH_SIZE", "32"))
+
 # --- CACHED LOADERS ---
 
 @lru_cache(maxsize=1)
 def load_emotion_model():
-    model_name = "j-hartmann/emotion-english-distilroberta-base"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-    return tokenizer, model
+    return load_classifier(EMOTION_MODEL)
 
+@traced("classify_emotion")
 def classify_emotion(text_en):
     try:
         tokenizer, model = load_emotion_model()
@@ -28,6 +33,35 @@ def classify_emotion(text_en):
     except Exception as e:
         return {"error": str(e)}
 
+@traced("classify_emotions_batch")
+def classify_emotions_batch(texts, max_batch_size=EMOTION_MAX_BATCH_SIZE):
+    """
+    Classify many texts at once. Returns one row of scores (0-100, in
+    emotion_labels order) per input text, in input order.
+
+    Texts are tokenized once, sorted by token length and cut into batches of
+    similar length, so each batch is only padded to its own longest text.
+    """
+    if not texts:
+        return []
+    tokenizer, model = load_emotion_model()
+    encoded = tokenizer(list(texts), truncation=True)
+    order = sorted(range(len(texts)), key=lambda i: len(encoded["input_ids"][i]))
+
+    results = [None] * len(texts)
+    for start in range(0, len(order), max_batch_size):
+        bucket = order[start:start + max_batch_size]
+        inputs = tokenizer.pad(
+            {key: [encoded[key][i] for i in bucket] for key in encoded.keys()},
+            return_tensors="pt",
+        )
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        probs = F.softmax(torch.as_tensor(logits), dim=1).tolist()
+        for i, row in zip(bucket, probs):
+            results[i] = [round(p * 100, 2) for p in row]
+    return results
+
 def emotion_pipeline(translated_text):
     try:
         emotion_scores = classify_emotion(translated_text)
@@ -0,0 +1,75 @@
+import json
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.auth_chat import ChatEmotion, Message
+from services.emotion_classifier import emotion_labels
+
+
+def encode_scores(scores: dict) -> str:
+    # compact: one number per label, in emotion_labels order
+    return json.dumps([scores.get(label, 0.0) for label in emotion_labels], separators=(",", ":"))
+
+
+def decode_scores(raw: str | None) -> dict | None:
+    if not raw:
+        return None
+    return dict(zip(emotion_labels, json.loads(raw)))
+
+
+def add_to_aggregate(db: Session, chat_id: int, scores: dict):
+    """
+    Add one message's scores to the chat's running sums (atomic increments, no read-modify-write).
+    Caller commits.
+    """
+    increments = {label: getattr(ChatEmotion, label) + scores.get(label, 0.0) for label in emotion_labels}
+    increments["message_count"] = ChatEmotion.message_count + 1
+    updated = db.query(ChatEmotion).filter(ChatEmotion.chat_id == chat_id).update(
+        increments, synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(ChatEmotion(chat_id=chat_id, message_count=1, **{l: scores.get(l, 0.0) for l in emotion_labels}))
+    except IntegrityError:
+        # first row was created concurrently; increment it instead
+        db.query(ChatEmotion).filter(ChatEmotion.chat_id == chat_id).update(
+            increments, synchronize_session=False
+        )
+
+
+def chat_emotion_averages(db: Session, chat_id: int) -> dict | None:
+    """
+    Mean score per label over the chat's user messages, highest first; None if nothing recorded.
+    """
+    stats = db.get(ChatEmotion, chat_id)
+    if stats is None or not stats.message_count:
+        return None
+    averages = {label: round(getattr(stats, label) / stats.message_count, 2) for label in emotion_labels}
+    return dict(sorted(averages.items(), key=lambda item: item[1], reverse=True))
+
+
+def dominant_chat_emotion(db: Session, chat_id: int) -> str | None:
+    averages = chat_emotion_averages(db, chat_id)
+    return next(iter(averages)) if averages else None
+
+
+def emotion_timeline(db: Session, chat_id: int) -> list[dict]:
+    rows = (
+        db.query(Message.id, Message.created_at, Message.emotion_scores)
+        .filter(Message.chat_id == chat_id, Message.role == "user", Message.emotion_scores.isnot(None))
+        .order_by(Message.created_at, Message.id)
+        .all()
+    )
+    timeline = []
+    for row in rows:
+        scores = decode_scores(row.emotion_scores)
+        timeline.append({
+            "message_id": row.id,
+            "created_at": row.created_at,
+            "dominant_emotion": max(scores, key=scores.get),
+            "scores": scores,
+        })
+    return timeline
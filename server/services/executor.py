@@ -0,0 +1,31 @@
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from services.thread_plan import INFERENCE_ROLE, pin_current_thread
+
+# Bounded pool for CPU-bound model work (torch inference) so it never runs on the event loop
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS,
+    thread_name_prefix="inference",
+    initializer=pin_current_thread,
+    initargs=(INFERENCE_ROLE,),
+)
+
+
+async def run_inference(func, *args, **kwargs):
+    """
+    Run a blocking model call on the inference pool and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    # carry the request context (trace spans) into the pool thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(inference_executor, partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executor():
+    inference_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,74 @@
+import os
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.auth_chat import ChatRequestKey
+
+# Finished turns are replayed for this long; an unfinished claim is taken over after IDEMPOTENCY_LOCK_S
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_LOCK_S = float(os.getenv("IDEMPOTENCY_LOCK_S", "120"))
+MAX_KEY_LENGTH = 128
+
+
+class RequestInProgress(Exception):
+    """The same idempotency key is still being processed (possibly by another worker)."""
+
+
+# DB helpers (blocking — always called through run_in_threadpool)
+def claim_key(db: Session, user_id: int, key: str) -> dict | None:
+    """
+    Claim `key` for a new turn. Returns the stored response if the turn already
+    finished, None if the caller should run it; raises RequestInProgress otherwise.
+    """
+    now = datetime.utcnow()
+    record = db.get(ChatRequestKey, (user_id, key))
+    if record is None:
+        db.add(ChatRequestKey(user_id=user_id, key=key, status="in_progress", created_at=now))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            # a concurrent retry claimed it first
+            db.rollback()
+            raise RequestInProgress(key)
+
+    if record.status == "done" and record.created_at > now - timedelta(hours=IDEMPOTENCY_TTL_HOURS):
+        return json.loads(record.response)
+    if record.status == "in_progress" and record.created_at > now - timedelta(seconds=IDEMPOTENCY_LOCK_S):
+        raise RequestInProgress(key)
+
+    # expired result or abandoned claim: run the turn again under this key
+    claimed = db.query(ChatRequestKey).filter(
+        ChatRequestKey.user_id == user_id,
+        ChatRequestKey.key == key,
+        ChatRequestKey.created_at == record.created_at,
+    ).update({"status": "in_progress", "response": None, "created_at": now}, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        raise RequestInProgress(key)
+    return None
+
+
+def complete_key(db: Session, user_id: int, key: str, response: dict):
+    db.query(ChatRequestKey).filter(ChatRequestKey.user_id == user_id, ChatRequestKey.key == key).update(
+        {"status": "done", "response": json.dumps(response, ensure_ascii=False)}, synchronize_session=False
+    )
+    db.commit()
+
+
+def release_key(db: Session, user_id: int, key: str):
+    # the turn failed before finishing: let a retry run it
+    db.query(ChatRequestKey).filter(
+        ChatRequestKey.user_id == user_id, ChatRequestKey.key == key, ChatRequestKey.status == "in_progress"
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def prune_keys(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    deleted = db.query(ChatRequestKey).filter(ChatRequestKey.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
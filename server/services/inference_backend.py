@@ -0,0 +1,87 @@
+import os
+import logging
+import torch
+from transformers import MarianMTModel, MarianTokenizer, AutoTokenizer, AutoModelForSequenceClassification
+from services.thread_plan import onnx_intra_op_threads
+
+logger = logging.getLogger(__name__)
+
+# torch  → PyTorch fp32 (eager, default)
+# int8   → PyTorch dynamic int8 quantization of nn.Linear layers
+# onnx   → ONNX Runtime via optimum (exported graphs cached in ONNX_CACHE_DIR)
+BACKENDS = ("torch", "int8", "onnx")
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "./onnx_cache")
+
+
+def _check_backend(backend: str | None) -> str:
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def _quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_session_options():
+    threads = onnx_intra_op_threads()
+    if threads is None:
+        return None
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return options
+
+
+def _load_onnx(ort_class_name: str, model_name: str):
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise RuntimeError("INFERENCE_BACKEND=onnx requires `pip install optimum[onnxruntime]`") from e
+
+    ort_class = getattr(ort, ort_class_name)
+    session_options = _onnx_session_options()
+    cache_path = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+    if os.path.isdir(cache_path):
+        return ort_class.from_pretrained(cache_path, session_options=session_options)
+
+    # first run: export the graph once and keep it for the next start
+    logger.info("Exporting %s to ONNX (%s)", model_name, cache_path)
+    model = ort_class.from_pretrained(model_name, export=True, session_options=session_options)
+    model.save_pretrained(cache_path)
+    return model
+
+
+def load_seq2seq(model_name: str, backend: str | None = None):
+    """
+    Load a Marian translation model on the configured backend. Returns (tokenizer, model).
+    """
+    backend = _check_backend(backend)
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+    if backend == "onnx":
+        return tokenizer, _load_onnx("ORTModelForSeq2SeqLM", model_name)
+
+    model = MarianMTModel.from_pretrained(model_name).eval()
+    if backend == "int8":
+        model = _quantize(model)
+    return tokenizer, model
+
+
+def load_classifier(model_name: str, backend: str | None = None):
+    """
+    Load a sequence-classification model on the configured backend. Returns (tokenizer, model).
+    """
+    backend = _check_backend(backend)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend == "onnx":
+        return tokenizer, _load_onnx("ORTModelForSequenceClassification", model_name)
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    if backend == "int8":
+        model = _quantize(model)
+    return tokenizer, model
@@ -0,0 +1,305 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed → open after `failure_threshold` consecutive failures; open → half-open
+    after `reset_timeout` seconds, where one trial call decides whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool | str:
+        """False while open; "trial" for the one half-open trial call, True otherwise."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return False
+
+    def release_trial(self):
+        # the trial ended without an outcome (cancelled): let the next call be the trial
+        with self._lock:
+            if self.state == "half_open":
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram (Prometheus-style `le` buckets, in ms).
+    """
+
+    BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 60000)
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        with self._lock:
+            index = next((i for i, le in enumerate(self.buckets) if ms <= le), len(self.buckets))
+            self.counts[index] += 1
+            self.count += 1
+            self.sum_ms += ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for le, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+                running += n
+                cumulative[str(le)] = running
+            return {"buckets": cumulative, "count": self.count, "sum_ms": round(self.sum_ms, 2)}
+
+
+class LLMClient:
+    """
+    Shared HTTP client for an OpenAI-compatible provider: keep-alive pool,
+    separate connect/read timeouts, jittered retries on 429/5xx and transport
+    errors, a circuit breaker, and per-model latency histograms.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: dict,
+        max_connections: int = 20,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.url = url
+        self.headers = headers
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+        self._async_client = None
+
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.retries = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    # --- clients ---
+
+    def _sync(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(headers=self.headers, timeout=self._timeout, limits=self._limits)
+        return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(headers=self.headers, timeout=self._timeout, limits=self._limits)
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    # --- retry policy ---
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return min(delay, self.backoff_max)
+
+    def _should_retry(self, attempt: int, error: Exception | None, response: httpx.Response | None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if response is not None:
+            return response.status_code in RETRY_STATUSES
+        return isinstance(error, httpx.TransportError)
+
+    def _check_breaker(self) -> bool:
+        """Raises while the circuit is open; True if this call is the half-open trial."""
+        allowed = self.breaker.allow()
+        if not allowed:
+            raise CircuitOpenError("LLM provider unavailable (circuit open)")
+        return allowed == "trial"
+
+    def _abandon(self, model: str, started: float, is_trial: bool, error: BaseException):
+        # a call that ended before _record must still settle the breaker: unexpected errors
+        # count as failures, cancellation (client went away) as neither
+        if isinstance(error, Exception):
+            self._record(model, started, False)
+        elif is_trial:
+            self.breaker.release_trial()
+
+    def _record(self, model: str, started: float, ok: bool):
+        with self._lock:
+            histogram = self.histograms.setdefault(model, LatencyHistogram())
+            if not ok:
+                self.errors += 1
+        histogram.observe((time.perf_counter() - started) * 1000)
+        (self.breaker.record_success if ok else self.breaker.record_failure)()
+
+    def _count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    # --- requests ---
+
+    def post(self, payload: dict) -> httpx.Response:
+        model = payload.get("model", "unknown")
+        attempt = 0
+        while True:
+            is_trial = self._check_breaker()
+            started, response, error = time.perf_counter(), None, None
+            try:
+                response = self._sync().post(self.url, json=payload)
+                ok = response.status_code < 500 and response.status_code != 429
+            except httpx.TransportError as e:
+                error, ok = e, False
+            except BaseException as e:
+                self._abandon(model, started, is_trial, e)
+                raise
+            self._record(model, started, ok)
+
+            if not ok and self._should_retry(attempt, error, response):
+                self._count_retry()
+                time.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+            if error is not None:
+                raise error
+            response.raise_for_status()
+            return response
+
+    async def apost(self, payload: dict) -> httpx.Response:
+        model = payload.get("model", "unknown")
+        attempt = 0
+        while True:
+            is_trial = self._check_breaker()
+            started, response, error = time.perf_counter(), None, None
+            try:
+                response = await self._async().post(self.url, json=payload)
+                ok = response.status_code < 500 and response.status_code != 429
+            except httpx.TransportError as e:
+                error, ok = e, False
+            except BaseException as e:
+                self._abandon(model, started, is_trial, e)
+                raise
+            self._record(model, started, ok)
+
+            if not ok and self._should_retry(attempt, error, response):
+                self._count_retry()
+                await asyncio.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+            if error is not None:
+                raise error
+            response.raise_for_status()
+            return response
+
+    @asynccontextmanager
+    async def astream(self, payload: dict):
+        """
+        Streaming POST. Retries only happen before the first byte is received;
+        latency is recorded as time to response headers.
+        """
+        model = payload.get("model", "unknown")
+        attempt = 0
+        while True:
+            is_trial = self._check_breaker()
+            started, streaming, recorded = time.perf_counter(), False, False
+            try:
+                async with self._async().stream("POST", self.url, json=payload) as response:
+                    ok = response.status_code < 500 and response.status_code != 429
+                    self._record(model, started, ok)
+                    recorded = True
+                    if ok:
+                        response.raise_for_status()
+                        streaming = True
+                        yield response
+                        return
+                    if not self._should_retry(attempt, None, response):
+                        response.raise_for_status()
+                    delay = self._backoff(attempt, response)
+            except httpx.TransportError as e:
+                # once the body is being consumed a retry would duplicate output
+                if streaming:
+                    raise
+                if not recorded:
+                    self._record(model, started, False)
+                if not self._should_retry(attempt, e, None):
+                    raise
+                delay = self._backoff(attempt, None)
+            except BaseException as e:
+                if not recorded:
+                    self._abandon(model, started, is_trial, e)
+                raise
+            self._count_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = dict(self.histograms)
+            retries, errors = self.retries, self.errors
+        return {
+            "retries": retries,
+            "errors": errors,
+            "circuit": self.breaker.stats(),
+            "latency_ms": {model: h.snapshot() for model, h in models.items()},
+        }
@@ -1,19 +1,55 @@
+
 import os
-import requests
+import json
+import re
+import httpx
+from dotenv import load_dotenv
+from services.llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+from services.metrics import traced
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
 API_URL = os.getenv("API_URL")
 
+LLM_MODEL = "meta-llama/Llama-4-Scout-17B-16E-Instruct"
+
+# HTTP client settings
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
 headers = {
     "Authorization": f"Bearer {API_KEY}",
     "Content-Type": "application/json"
 }
-def get_llm_summary(conversation_en: list[dict]) -> dict:
-    """
-    Send full conversation to the LLM with a summarization prompt.
-    """
+
+# Shared client: keep-alive pool, retries with jittered backoff, circuit breaker
+llm_client = LLMClient(
+    API_URL,
+    headers,
+    max_connections=LLM_MAX_CONNECTIONS,
+    connect_timeout=LLM_CONNECT_TIMEOUT,
+    read_timeout=LLM_READ_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    breaker=CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET),
+)
+
+
+async def close_clients():
+    await llm_client.aclose()
+
+
+# --- payload builders ---
+
+def build_summary_payload(conversation_en: list[dict]) -> dict:
     summary_prompt = f"""
     You are an intelligent assistant. Your task is to summarize the conversation below in **English**.
 
@@ -29,31 +65,15 @@ def get_llm_summary(conversation_en: list[dict]) -> dict:
     Summary: <your concise summary>
     """
 
-
-    payload = {
-        "model": "meta-llama/Llama-4-Scout-17B-16E-Instruct",
+    return {
+        "model": LLM_MODEL,
         "messages": [{"role": "system", "content": summary_prompt}],
         "temperature": 0.3,
         "max_tokens": 256
     }
 
-    try:
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "success": True,
-            "response": data.get("choices", [{}])[0].get("message", {}).get("content", ""),
-            "raw": data
-        }
-    except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"Request failed: {str(e)}"}
-
 
-def get_llm_response(conversation_en: list[dict], emotion_summary: str) -> dict:
-    """
-    Send full conversation and last detected emotion to the LLM and return the response.
-    """
+def build_chat_payload(conversation_en: list[dict], emotion_summary: str) -> dict:
     prompt = (
         "You are a professional psychotherapist who communicates in clear and supportive English. "
         "Engage naturally with the user, and occasionally ask thoughtful questions to better understand their situation so you can provide helpful guidance. "
@@ -65,23 +85,109 @@ def get_llm_response(conversation_en: list[dict], emotion_summary: str) -> dict:
     # Build messages for Together API
     messages = [{"role": "system", "content": prompt}] + conversation_en
 
-    payload = {
-        "model": "meta-llama/Llama-4-Scout-17B-16E-Instruct",
+    return {
+        "model": LLM_MODEL,
         "messages": messages,
         "temperature": 0.7,
         "max_tokens": 512
     }
 
+
+def parse_summary(raw_response: str) -> tuple[str | None, str | None]:
+    """
+    Extract (title, summary) from a "Title: ... / Summary: ..." completion.
+    """
+    title_match = re.search(r"Title\s*:\s*(.+)", raw_response)
+    summary_match = re.search(r"Summary\s*:\s*(.+)", raw_response)
+    return (
+        title_match.group(1).strip() if title_match else None,
+        summary_match.group(1).strip() if summary_match else None,
+    )
+
+
+def _parse_response(response: httpx.Response) -> dict:
+    data = response.json()
+    return {
+        "success": True,
+        "response": data.get("choices", [{}])[0].get("message", {}).get("content", ""),
+        "raw": data
+    }
+
+
+def _post(payload: dict) -> dict:
+    try:
+        return _parse_response(llm_client.post(payload))
+    except CircuitOpenError as e:
+        return {"success": False, "error": str(e)}
+    except httpx.HTTPError as e:
+        return {"success": False, "error": f"Request failed: {str(e)}"}
+    except Exception as e:
+        return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+
+async def _apost(payload: dict) -> dict:
     try:
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "success": True,
-            "response": data.get("choices", [{}])[0].get("message", {}).get("content", ""),
-            "raw": data
-        }
-    except requests.exceptions.RequestException as e:
+        return _parse_response(await llm_client.apost(payload))
+    except CircuitOpenError as e:
+        return {"success": False, "error": str(e)}
+    except httpx.HTTPError as e:
         return {"success": False, "error": f"Request failed: {str(e)}"}
     except Exception as e:
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+
+# --- public API ---
+
+@traced("llm_summary")
+def get_llm_summary(conversation_en: list[dict]) -> dict:
+    """
+    Send full conversation to the LLM with a summarization prompt.
+    """
+    return _post(build_summary_payload(conversation_en))
+
+
+@traced("llm_response")
+def get_llm_response(conversation_en: list[dict], emotion_summary: str) -> dict:
+    """
+    Send full conversation and last detected emotion to the LLM and return the response.
+    """
+    return _post(build_chat_payload(conversation_en, emotion_summary))
+
+
+@traced("llm_summary")
+async def aget_llm_summary(conversation_en: list[dict]) -> dict:
+    """
+    Async variant of get_llm_summary.
+    """
+    return await _apost(build_summary_payload(conversation_en))
+
+
+@traced("llm_response")
+async def aget_llm_response(conversation_en: list[dict], emotion_summary: str) -> dict:
+    """
+    Async variant of get_llm_response.
+    """
+    return await _apost(build_chat_payload(conversation_en, emotion_summary))
+
+
+async def astream_llm_response(conversation_en: list[dict], emotion_summary: str):
+    """
+    Stream the chat completion (`stream: true`) and yield English text deltas as they arrive.
+    Raises httpx.HTTPError / CircuitOpenError if the request fails.
+    """
+    payload = {**build_chat_payload(conversation_en, emotion_summary), "stream": True}
+
+    async with llm_client.astream(payload) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            delta = json.loads(data).get("choices", [{}])[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def llm_stats() -> dict:
+    return llm_client.stats()
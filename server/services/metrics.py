@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("trace")
+
+# Log one structured JSON line per request (spans included); only for requests slower than TRACE_SLOW_MS
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "0"))
+
+# Prometheus default-style buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# every Counter / Histogram, in creation order, for /metrics
+REGISTRY: list = []
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, seconds: float, *labels):
+        index = next((i for i, le in enumerate(self.buckets) if seconds <= le), len(self.buckets))
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            running = 0
+            for le, n in zip(list(self.buckets) + ["+Inf"], counts):
+                running += n
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in a pipeline stage", ("stage",))
+STAGE_ERRORS = Counter("stage_errors_total", "Pipeline stage calls that failed or returned an error result", ("stage",))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency (until the body is sent)", ("method", "route", "status"))
+DB_SECONDS = Histogram("db_query_duration_seconds", "SQL statement latency", ("operation",),
+                       buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+DB_ERRORS = Counter("db_errors_total", "SQL statements that raised", ("operation",))
+
+
+# ---------------------------
+# Per-request traces
+# ---------------------------
+@dataclass
+class Trace:
+    request_id: str
+    started: float = field(default_factory=time.perf_counter)
+    spans: list = field(default_factory=list)
+    db_queries: int = 0
+    db_ms: float = 0.0
+
+    def add_span(self, name: str, started: float, ended: float, ok: bool):
+        # list.append is atomic, so spans may come from pool threads
+        self.spans.append({
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 2),
+            "ms": round((ended - started) * 1000, 2),
+            "ok": ok,
+        })
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def _is_error_result(result) -> bool:
+    # the services report failures as values, not exceptions
+    if isinstance(result, str):
+        return result.startswith("❌")
+    if isinstance(result, dict):
+        return "error" in result or result.get("success") is False
+    return False
+
+
+def _record(stage: str, started: float, ok: bool):
+    ended = time.perf_counter()
+    STAGE_SECONDS.observe(ended - started, stage)
+    if not ok:
+        STAGE_ERRORS.inc(stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, started, ended, ok)
+
+
+def traced(stage: str):
+    """
+    Decorator: time every call of a sync or async function as `stage`
+    (histogram + error counter + span on the current request trace).
+    """
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started, ok = time.perf_counter(), False
+                try:
+                    result = await func(*args, **kwargs)
+                    ok = not _is_error_result(result)
+                    return result
+                finally:
+                    _record(stage, started, ok)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started, ok = time.perf_counter(), False
+            try:
+                result = func(*args, **kwargs)
+                ok = not _is_error_result(result)
+                return result
+            finally:
+                _record(stage, started, ok)
+        return wrapper
+    return decorate
+
+
+def _route_template(scope) -> str:
+    # "/chats/42/messages" -> "/chats/{chat_id}/messages"; keeps label cardinality bounded
+    route = scope.get("route")
+    template, regex = getattr(route, "path", None), getattr(route, "path_regex", None)
+    if template is None:
+        return "unmatched"
+    # the matched route may hold its path without the include_router prefix (FastAPI resolves
+    # included routers lazily): keep the literal prefix of the request path in front of it
+    path = scope["path"]
+    if regex is not None:
+        for i, char in enumerate(path):
+            if char == "/" and regex.match(path[i:]):
+                return path[:i] + template
+    return template
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: request latency histogram by route template, an
+    X-Request-ID response header, and (with TRACE_LOG=1) one JSON log line
+    per request with its spans and DB time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        trace = Trace(request_id)
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            route = _route_template(scope)
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            if TRACE_LOG and elapsed * 1000 >= TRACE_SLOW_MS:
+                logger.info(json.dumps({
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "route": route,
+                    "status": status,
+                    "ms": round(elapsed * 1000, 2),
+                    "db_queries": trace.db_queries,
+                    "db_ms": round(trace.db_ms, 2),
+                    "spans": trace.spans,
+                }, ensure_ascii=False))
+
+
+# ---------------------------
+# SQLAlchemy instrumentation
+# ---------------------------
+def _operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def instrument_engine(engine):
+    """
+    Time every statement on `engine` (per-operation histogram, error counter,
+    DB time and count on the current request trace).
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_SECONDS.observe(elapsed, _operation(statement))
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.db_queries += 1
+            trace.db_ms += elapsed * 1000
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        DB_ERRORS.inc(_operation(context.statement or ""))
+
+
+# ---------------------------
+# Exposition
+# ---------------------------
+_collectors: list = []
+
+
+def register_collector(func):
+    """
+    `func()` returns (name, type, help, [(labels dict, value), ...]) tuples,
+    read at scrape time (queue depths, cache stats, ...).
+    """
+    _collectors.append(func)
+    return func
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception:
+            logger.exception("metrics collector %s failed", getattr(collect, "__name__", collect))
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_str = _format_labels(tuple(labels), tuple(labels.values()))
+                lines.append(f"{name}{label_str} {value}")
+    return "\n".join(lines) + "\n"
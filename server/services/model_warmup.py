@@ -0,0 +1,76 @@
+import os
+import asyncio
+import logging
+import time
+
+from services.translataion import load_ar_to_en, load_en_to_ar, _translate_batch, ar_to_en_policy, en_to_ar_policy
+from services.emotion_classifier import load_emotion_model, classify_emotion
+
+logger = logging.getLogger(__name__)
+
+# Load + warm all models at startup (set PRELOAD_MODELS=0 to keep lazy loading, e.g. in dev)
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1"
+
+
+def _warm_ar_to_en():
+    load_ar_to_en()
+    _translate_batch(load_ar_to_en, ["مرحبا"], ar_to_en_policy)
+
+
+def _warm_en_to_ar():
+    load_en_to_ar()
+    _translate_batch(load_en_to_ar, ["Hello"], en_to_ar_policy)
+
+
+def _warm_emotion():
+    load_emotion_model()
+    result = classify_emotion("I am fine.")
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+
+WARMUPS = {
+    "ar_to_en": _warm_ar_to_en,
+    "en_to_ar": _warm_en_to_ar,
+    "emotion": _warm_emotion,
+}
+
+model_status = {name: {"loaded": False, "load_s": None, "error": None} for name in WARMUPS}
+
+
+def _load_and_warm(name: str):
+    started = time.perf_counter()
+    try:
+        WARMUPS[name]()
+    except Exception as e:
+        model_status[name]["error"] = str(e)
+        logger.exception("Model %s failed to load", name)
+        return
+    elapsed = round(time.perf_counter() - started, 2)
+    model_status[name].update(loaded=True, load_s=elapsed, error=None)
+    logger.info("Model %s loaded and warmed in %.2fs", name, elapsed)
+
+
+async def warm_up_models():
+    """
+    Load and warm all models in parallel (one thread each).
+    """
+    started = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(_load_and_warm, name) for name in WARMUPS))
+    logger.info("Model warm-up finished in %.2fs", time.perf_counter() - started)
+
+
+def preload_weights():
+    """
+    Load weights only (no inference) — used by the preforked server in the
+    parent process so workers share the tensors copy-on-write. Running
+    inference before fork would start torch thread pools that do not survive it.
+    """
+    for loader in (load_ar_to_en, load_en_to_ar, load_emotion_model):
+        started = time.perf_counter()
+        loader()
+        logger.info("Preloaded %s in %.2fs", loader.__name__, time.perf_counter() - started)
+
+
+def models_ready() -> bool:
+    return all(status["loaded"] for status in model_status.values())
@@ -0,0 +1,29 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Inverse of encode_cursor. Raises ValueError on a malformed cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def before(created_col, id_col, cursor: tuple[datetime, int]):
+    """
+    Keyset predicate for (created_at, id) DESC pagination: rows strictly older than the cursor.
+    """
+    created_at, row_id = cursor
+    return or_(created_col < created_at, and_(created_col == created_at, id_col < row_id))
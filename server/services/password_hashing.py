@@ -0,0 +1,76 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# bcrypt cost factor (each +1 doubles the work); existing hashes keep their own cost
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Dedicated processes for bcrypt so a login burst never starves the request threadpool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash/verify calls allowed to wait for a worker before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashPoolBusy(Exception):
+    """Too many password operations are already queued."""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_pending = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    # created lazily per process: a pool inherited from a preforked parent is unusable
+    if _pool is None or _pool_pid != os.getpid():
+        # spawn: workers start clean instead of forking a process that holds the models
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+async def _run(func, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HashPoolBusy(f"{_pending} password operations already pending")
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), func, *args)
+    finally:
+        _pending -= 1
+
+
+async def ahash_password(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+def hash_pool_stats() -> dict:
+    return {"workers": PASSWORD_HASH_WORKERS, "pending": _pending, "max_pending": PASSWORD_HASH_MAX_PENDING}
+
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
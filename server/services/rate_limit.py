@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Login attempts: tokens refilled per minute and bucket size, per client IP and per username
+LOGIN_RATE_PER_IP = float(os.getenv("LOGIN_RATE_PER_IP", "30"))
+LOGIN_BURST_PER_IP = int(os.getenv("LOGIN_BURST_PER_IP", "10"))
+LOGIN_RATE_PER_USERNAME = float(os.getenv("LOGIN_RATE_PER_USERNAME", "10"))
+LOGIN_BURST_PER_USERNAME = int(os.getenv("LOGIN_BURST_PER_USERNAME", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets kept in this process (bounded LRU of keys). A shared store
+    (e.g. Redis) only needs the same `take` method to replace it, so limits
+    hold across workers.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate_per_s: float, burst: int) -> float:
+        """
+        Take one token. Returns 0 if allowed, else seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate_per_s)
+            if tokens >= 1:
+                wait, tokens = 0.0, tokens - 1
+            else:
+                wait = (1 - tokens) / rate_per_s if rate_per_s > 0 else float("inf")
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class RateLimiter:
+    def __init__(self, name: str, per_minute: float, burst: int, store=None):
+        # a bucket that never refills would ask clients to retry after an infinite wait
+        if per_minute <= 0 or burst < 1:
+            raise ValueError(f"{name}: rate limit needs per_minute > 0 and burst >= 1")
+        self.name = name
+        self.rate_per_s = per_minute / 60
+        self.burst = burst
+        self.store = store or InMemoryBucketStore()
+        self.rejected = 0
+
+    def check(self, key: str) -> float:
+        wait = self.store.take(f"{self.name}:{key}", self.rate_per_s, self.burst)
+        if wait:
+            self.rejected += 1
+        return wait
+
+
+login_store = InMemoryBucketStore()
+login_ip_limiter = RateLimiter("login-ip", LOGIN_RATE_PER_IP, LOGIN_BURST_PER_IP, login_store)
+login_user_limiter = RateLimiter("login-user", LOGIN_RATE_PER_USERNAME, LOGIN_BURST_PER_USERNAME, login_store)
@@ -0,0 +1,59 @@
+import re
+
+# End of sentence: . ! ? … (and Arabic ؟ ؛) followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?…؟؛])\s+")
+
+
+class SentenceStream:
+    """
+    Accumulate streamed text deltas and emit complete sentences as soon as they end.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, delta: str) -> list[str]:
+        self._buffer += delta
+        parts = _SENTENCE_END.split(self._buffer)
+        # the last part is still open (no terminator + whitespace seen yet)
+        self._buffer = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self) -> list[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    # last resort for run-on text: cut on word boundaries so no segment exceeds max_chars
+    chunks, current = [], ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            chunks.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_sentences(text: str, max_chars: int = 400) -> list[list[str]]:
+    """
+    Split text into lines, and each line into sentences (long sentences are
+    further cut on word boundaries). Use `join_sentences` to rebuild the text.
+    """
+    lines = []
+    for line in (text or "").split("\n"):
+        segments = []
+        for sentence in _SENTENCE_END.split(line.strip()):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            segments.extend([sentence] if len(sentence) <= max_chars else _split_long(sentence, max_chars))
+        lines.append(segments)
+    return lines
+
+
+def join_sentences(lines: list[list[str]]) -> str:
+    return "\n".join(" ".join(segments) for segments in lines)
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models.auth_chat import Message, ChatSummary
+from services.emotion_classifier import emotion_pipeline
+from services.emotion_stats import dominant_chat_emotion
+from services.executor import run_inference
+from services.llm_service import aget_llm_summary, parse_summary
+from services.translataion import atranslate_en_to_ar
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryError(Exception):
+    """Summarization failed; `retryable` tells the job queue whether to try again."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# ✅ Manual mapping for emotions (no bad MT translations)
+EMOTION_MAP = {
+    "anger": "غضب",
+    "disgust": "اشمئزاز",
+    "fear": "خوف",
+    "joy": "فرح",
+    "neutral": "عادي",
+    "sadness": "حزن",
+    "surprise": "مفاجأة"
+}
+
+# ✅ Smarter title translator
+async def smart_translate_title(text: str) -> str:
+    if not text or text.lower() in ["untitled", "title"]:
+        return "بدون عنوان"
+    try:
+        result = await atranslate_en_to_ar(text)
+        # Heuristic: if translation looks broken, fallback to English
+        if len(result.split()) < 2 or "مُحَار" in result or result.startswith("❌"):
+            return text
+        return result
+    except Exception:
+        return text or "بدون عنوان"
+
+
+# 🌍 Translate (with fallbacks)
+async def safe_translate(func, text, fallback):
+    try:
+        result = await func(text)
+        if result.startswith("❌ Error"):
+            return fallback
+        return result
+    except Exception:
+        return fallback
+
+
+# DB helpers (blocking — always called through run_in_threadpool)
+def load_chat_messages(db: Session, chat_id: int) -> list[Message]:
+    return db.query(Message).filter(
+        Message.chat_id == chat_id
+    ).order_by(Message.created_at.asc()).all()
+
+
+def message_marker(db: Session, chat_id: int) -> tuple[int | None, int]:
+    """
+    (newest message id, message count) of a chat — one indexed aggregate query.
+    """
+    last_id, count = db.query(func.max(Message.id), func.count(Message.id)).filter(
+        Message.chat_id == chat_id
+    ).one()
+    return last_id, count
+
+
+def fingerprint_messages(messages: list[Message]) -> tuple[int | None, int, str]:
+    """
+    (newest message id, message count, rolling hash of ids/roles/English text).
+    """
+    digest = hashlib.sha256()
+    for m in messages:
+        digest.update(f"{m.id}\x1f{m.role}\x1f{m.content_en or ''}\x1e".encode())
+    last_id = max((m.id for m in messages), default=None)
+    return last_id, len(messages), digest.hexdigest()[:32]
+
+
+def get_fresh_summary(db: Session, chat_id: int) -> ChatSummary | None:
+    """
+    The stored summary if no message was added since it was built (messages are
+    append-only, so newest id + count identify the message set), else None.
+    """
+    chat_summary = db.query(ChatSummary).filter(ChatSummary.chat_id == chat_id).first()
+    if chat_summary is None or chat_summary.source_last_message_id is None:
+        return None
+    if (chat_summary.source_last_message_id, chat_summary.source_message_count) != message_marker(db, chat_id):
+        return None
+    return chat_summary
+
+
+def summary_payload(chat_summary: ChatSummary) -> dict:
+    return {
+        "chat_id": chat_summary.chat_id,
+        "title": chat_summary.title,
+        "summary": chat_summary.summary,
+        "dominant_emotion": chat_summary.dominant_emotion,
+    }
+
+
+def upsert_summary(db: Session, chat_id: int, title_ar: str, summary_ar: str, dominant_emotion_ar: str,
+                   fingerprint: tuple[int | None, int, str]) -> ChatSummary:
+    last_id, count, source_hash = fingerprint
+    chat_summary = db.query(ChatSummary).filter(ChatSummary.chat_id == chat_id).first()
+    if chat_summary:
+        chat_summary.title = title_ar
+        chat_summary.summary = summary_ar
+        chat_summary.dominant_emotion = dominant_emotion_ar
+    else:
+        chat_summary = ChatSummary(
+            chat_id=chat_id,
+            title=title_ar,
+            summary=summary_ar,
+            dominant_emotion=dominant_emotion_ar
+        )
+        db.add(chat_summary)
+    chat_summary.source_last_message_id = last_id
+    chat_summary.source_message_count = count
+    chat_summary.source_hash = source_hash
+
+    db.commit()
+    return chat_summary
+
+
+def _stored_summary_matching(db: Session, chat_id: int, fingerprint: tuple) -> ChatSummary | None:
+    chat_summary = db.query(ChatSummary).filter(ChatSummary.chat_id == chat_id).first()
+    if chat_summary is None:
+        return None
+    stored = (chat_summary.source_last_message_id, chat_summary.source_message_count, chat_summary.source_hash)
+    return chat_summary if stored == fingerprint else None
+
+
+async def summarize_chat(db: Session, chat_id: int) -> dict:
+    """
+    Classify, summarize and translate a chat, then store its ChatSummary.
+    Returns the stored summary unchanged if the messages match its fingerprint.
+    Raises SummaryError on failure.
+    """
+    messages_db = await run_in_threadpool(load_chat_messages, db, chat_id)
+    if not messages_db:
+        raise SummaryError("No messages in chat", retryable=False)
+
+    fingerprint = fingerprint_messages(messages_db)
+    stored = await run_in_threadpool(_stored_summary_matching, db, chat_id, fingerprint)
+    if stored is not None:
+        logger.info("chat %s unchanged since its last summary, skipping", chat_id)
+        return summary_payload(stored)
+
+    # 🔄 Prepare English conversation for LLM
+    conversation_en = [
+        {"role": m.role, "content": m.content_en}
+        for m in messages_db if m.content_en
+    ]
+
+    # 🧠 Dominant emotion from the running per-message aggregate (no extra inference)
+    dominant_emotion = await run_in_threadpool(dominant_chat_emotion, db, chat_id)
+    if dominant_emotion is None:
+        # chats from before per-message scores were stored: classify all user text once
+        user_text = " ".join(
+            [m.content_en for m in messages_db if m.role == "user" and m.content_en]
+        )
+        emotions = await run_inference(emotion_pipeline, user_text)
+        if "error" in emotions:
+            dominant_emotion = "neutral"
+        else:
+            dominant_emotion = emotions.get("dominant_emotion", "neutral")
+
+    # 📋 Summarize with LLM
+    llm_summary = await aget_llm_summary(conversation_en)
+    if not llm_summary.get("success"):
+        raise SummaryError(f"LLM summarization failed: {llm_summary.get('error', 'unknown')}")
+
+    raw_response = llm_summary.get("response", "")
+    logger.debug("summary for chat %s: %s", chat_id, raw_response)
+
+    # 📝 Extract Title & Summary safely
+    title_en, summary_en = parse_summary(raw_response)
+    title_en = title_en or "Untitled"
+    summary_en = summary_en or "❌ No summary generated"
+
+    title_ar = await smart_translate_title(title_en)
+    summary_ar = await safe_translate(atranslate_en_to_ar, summary_en, "❌ لم يتم توليد ملخص")
+    dominant_emotion_ar = EMOTION_MAP.get(dominant_emotion.lower(), "عادي")
+
+    # 💾 Save or update summary
+    await run_in_threadpool(upsert_summary, db, chat_id, title_ar, summary_ar, dominant_emotion_ar, fingerprint)
+
+    return {
+        "chat_id": chat_id,
+        "title": title_ar,
+        "summary": summary_ar,
+        "dominant_emotion": dominant_emotion_ar
+    }
+
+
+async def summarize_chat_new_session(chat_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        return await summarize_chat(db, chat_id)
+    finally:
+        await run_in_threadpool(db.close)
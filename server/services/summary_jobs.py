@@ -0,0 +1,237 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from db import SessionLocal
+from models.auth_chat import ChatSummary, SummaryJob
+from services.summarizer import SummaryError, message_marker, summarize_chat_new_session
+
+logger = logging.getLogger(__name__)
+
+# Background summarization settings
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+SUMMARY_MAX_ATTEMPTS = int(os.getenv("SUMMARY_MAX_ATTEMPTS", "3"))
+SUMMARY_RETRY_DELAY = float(os.getenv("SUMMARY_RETRY_DELAY", "10"))      # seconds, doubled per attempt
+SUMMARY_POLL_INTERVAL = float(os.getenv("SUMMARY_POLL_INTERVAL", "2"))
+SUMMARY_JOB_TIMEOUT = float(os.getenv("SUMMARY_JOB_TIMEOUT", "300"))     # a running job older than this is requeued
+SUMMARY_STALE_SWEEP_INTERVAL = float(os.getenv("SUMMARY_STALE_SWEEP_INTERVAL", "60"))   # how often to look for them
+# enqueue a summary automatically once N messages were added since the chat's last summary (0 disables)
+SUMMARY_AUTO_EVERY = int(os.getenv("SUMMARY_AUTO_EVERY", "10"))
+
+_wakeup: asyncio.Event | None = None
+_loop: asyncio.AbstractEventLoop | None = None   # the loop _wakeup belongs to
+_workers: list[asyncio.Task] = []
+
+
+# ---------------------------
+# Queue operations (blocking — call through run_in_threadpool)
+# ---------------------------
+def enqueue_summary(db: Session, chat_id: int) -> SummaryJob:
+    """
+    Idempotent per chat: returns the chat's already-queued job if there is one,
+    or its running job if no message was added since that job was requested.
+    """
+    last_message_id, _ = message_marker(db, chat_id)
+    job = db.query(SummaryJob).filter(
+        SummaryJob.chat_id == chat_id, SummaryJob.status.in_(("queued", "running"))
+    ).order_by(SummaryJob.id.desc()).first()
+    if job and job.status == "queued":
+        if job.last_message_id != last_message_id:
+            job.last_message_id = last_message_id
+            db.commit()
+        return job
+    if job and job.last_message_id == last_message_id:
+        return job
+    job = SummaryJob(chat_id=chat_id, status="queued", last_message_id=last_message_id)
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # another request queued one concurrently (partial unique index); a worker may
+        # already have claimed it, or even finished it, by the time we look
+        db.rollback()
+        job = db.query(SummaryJob).filter(
+            SummaryJob.chat_id == chat_id, SummaryJob.status.in_(("queued", "running"))
+        ).order_by(SummaryJob.id.desc()).first()
+        return job if job is not None else enqueue_summary(db, chat_id)
+    db.refresh(job)
+    return job
+
+
+def maybe_enqueue_auto_summary(db: Session, chat_id: int) -> SummaryJob | None:
+    # counted against the last summary, not `count % N`: a turn adds two messages, so an odd N
+    # would only ever be hit every 2N messages
+    if SUMMARY_AUTO_EVERY <= 0:
+        return None
+    _, count = message_marker(db, chat_id)
+    summarized = db.query(ChatSummary.source_message_count).filter(ChatSummary.chat_id == chat_id).scalar()
+    if count - (summarized or 0) < SUMMARY_AUTO_EVERY:
+        return None
+    # a job already pending for the chat stands in for this one until it has stored its summary
+    pending = db.query(SummaryJob.id).filter(
+        SummaryJob.chat_id == chat_id, SummaryJob.status.in_(("queued", "running"))
+    ).first()
+    return None if pending else enqueue_summary(db, chat_id)
+
+
+def _claim_next_job() -> tuple[int, int] | None:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        running = aliased(SummaryJob)
+        job = (
+            db.query(SummaryJob)
+            .filter(
+                SummaryJob.status == "queued",
+                SummaryJob.run_after <= now,
+                # never summarize the same chat twice at once
+                ~exists().where(running.chat_id == SummaryJob.chat_id, running.status == "running"),
+            )
+            .order_by(SummaryJob.id)
+            .first()
+        )
+        if job is None:
+            return None
+        # conditional update = atomic claim, also across worker processes
+        claimed = (
+            db.query(SummaryJob)
+            .filter(SummaryJob.id == job.id, SummaryJob.status == "queued")
+            .update({"status": "running", "attempts": SummaryJob.attempts + 1, "updated_at": now},
+                    synchronize_session=False)
+        )
+        db.commit()
+        return (job.id, job.chat_id) if claimed else None
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: int, error: str | None = None, retryable: bool = True):
+    db = SessionLocal()
+    try:
+        job = db.get(SummaryJob, job_id)
+        if job is None:   # chat deleted meanwhile
+            return
+        now = datetime.utcnow()
+        job.updated_at = now
+        if error is None:
+            job.status, job.last_error = "done", None
+        elif retryable and job.attempts < SUMMARY_MAX_ATTEMPTS:
+            job.status, job.last_error = "queued", error
+            job.run_after = now + timedelta(seconds=SUMMARY_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status, job.last_error = "failed", error
+        try:
+            db.commit()
+        except IntegrityError:
+            # a fresh job for this chat was queued meanwhile; it supersedes the retry
+            db.rollback()
+            db.query(SummaryJob).filter(SummaryJob.id == job_id).update(
+                {"status": "failed", "last_error": error, "updated_at": now}, synchronize_session=False
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def _requeue_stale_jobs():
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(seconds=SUMMARY_JOB_TIMEOUT)
+        stale = (
+            db.query(SummaryJob)
+            .filter(SummaryJob.status == "running", SummaryJob.updated_at < cutoff)
+            .all()
+        )
+        for job in stale:
+            _finish_job(job.id, "worker stopped while running", retryable=True)
+    finally:
+        db.close()
+
+
+# ---------------------------
+# Worker pool
+# ---------------------------
+def summary_job_counts() -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        return dict(db.query(SummaryJob.status, func.count(SummaryJob.id)).group_by(SummaryJob.status).all())
+    finally:
+        db.close()
+
+
+def notify_workers():
+    # also called from threadpool threads (e.g. _persist_assistant); asyncio.Event is not thread-safe
+    if _wakeup is None or _loop is None or _loop.is_closed():
+        return
+    try:
+        on_loop = asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        _wakeup.set()
+    else:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def _run_next_job() -> bool:
+    claimed = await run_in_threadpool(_claim_next_job)
+    if claimed is None:
+        return False
+
+    job_id, chat_id = claimed
+    try:
+        await summarize_chat_new_session(chat_id)
+    except SummaryError as e:
+        logger.warning("summary job %s (chat %s) failed: %s", job_id, chat_id, e)
+        await run_in_threadpool(_finish_job, job_id, str(e), e.retryable)
+    except Exception as e:
+        logger.exception("summary job %s (chat %s) crashed", job_id, chat_id)
+        await run_in_threadpool(_finish_job, job_id, str(e), True)
+    else:
+        await run_in_threadpool(_finish_job, job_id)
+    return True
+
+
+async def _worker(index: int):
+    last_sweep = time.monotonic()
+    while True:
+        try:
+            # jobs left running by a crashed worker (any process) would block their chat forever
+            if index == 0 and time.monotonic() - last_sweep >= SUMMARY_STALE_SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                await run_in_threadpool(_requeue_stale_jobs)
+            if await _run_next_job():
+                continue
+        except Exception:
+            # e.g. "database is locked": keep the worker alive and try again after a pause
+            logger.exception("summary worker %s failed", index)
+            await asyncio.sleep(SUMMARY_POLL_INTERVAL)
+            continue
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), SUMMARY_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_workers():
+    global _wakeup, _loop
+    _wakeup = asyncio.Event()
+    _loop = asyncio.get_running_loop()
+    await run_in_threadpool(_requeue_stale_jobs)
+    _workers.extend(asyncio.create_task(_worker(i)) for i in range(SUMMARY_WORKERS))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,173 @@
+import os
+import math
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# auto → size torch thread pools from the CPUs this worker may use; off → torch defaults (one thread per core)
+INFERENCE_THREAD_PLAN = os.getenv("INFERENCE_THREAD_PLAN", "auto")
+# CPU budget of the whole box / container (0 = detect from affinity mask and cgroup quota)
+INFERENCE_CPUS = float(os.getenv("INFERENCE_CPUS", "0"))
+# Explicit thread counts (0 = planned)
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "1"))
+# off | worker (pin each worker process to its own cores) | model (also pin each model's threads)
+INFERENCE_CPU_AFFINITY = os.getenv("INFERENCE_CPU_AFFINITY", "off")
+# Server processes sharing the CPUs (same variable gunicorn.conf.py reads); under gunicorn,
+# post_fork exports the configured worker count (incl. `-w N`) as INFERENCE_WORKER_COUNT
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Threads that call into torch concurrently in one worker, by role (see services/translataion.py, executor.py)
+TRANSLATION_ROLES = ("translate-ar-en", "translate-en-ar")
+INFERENCE_ROLE = "inference"
+
+
+def allowed_cpus() -> list[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:   # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_quota(root: str = "/sys/fs/cgroup") -> float | None:
+    """CPUs granted by the container's CFS quota (cgroup v2 or v1), None if unlimited."""
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class ThreadPlan:
+    cpus: int                                   # cores this worker may keep busy
+    intra_op: int                               # torch threads per model call
+    inter_op: int
+    workers: int
+    worker_index: int | None = None
+    affinity: list[int] | None = None           # this worker's cores, when pinned
+    role_affinity: dict[str, list[int]] = field(default_factory=dict)
+
+
+def _role_shares(inference_workers: int) -> list[tuple[str, int]]:
+    return [(role, 1) for role in TRANSLATION_ROLES] + [(INFERENCE_ROLE, max(1, inference_workers))]
+
+
+def server_workers() -> int:
+    return int(os.getenv("INFERENCE_WORKER_COUNT") or WEB_CONCURRENCY)
+
+
+def plan_threads(workers: int | None = None, worker_index: int | None = None,
+                 inference_workers: int | None = None, affinity: str = INFERENCE_CPU_AFFINITY,
+                 cpus: list[int] | None = None, quota: float | None = None) -> ThreadPlan:
+    """
+    Split the CPU budget (affinity mask, capped by the cgroup quota or
+    INFERENCE_CPUS) evenly between `workers` processes, then between the
+    threads of one worker that run models at the same time: the two
+    translation batchers and the inference pool. intra_op = cores per
+    concurrent model call, so a fully loaded box runs about one torch
+    thread per core instead of one per core in every call.
+    """
+    if inference_workers is None:
+        from services.executor import INFERENCE_WORKERS
+        inference_workers = INFERENCE_WORKERS
+    workers = workers if workers is not None else server_workers()
+    cpus = cpus if cpus is not None else allowed_cpus()
+    quota = quota if quota is not None else (INFERENCE_CPUS or cgroup_cpu_quota())
+    budget = len(cpus) if not quota else max(1, min(len(cpus), math.floor(quota)))
+    workers = max(1, workers)
+
+    per_worker = max(1, budget // workers)
+    shares = _role_shares(inference_workers)
+    concurrent_calls = sum(share for _, share in shares)
+    intra_op = TORCH_INTRA_OP_THREADS or max(1, per_worker // concurrent_calls)
+    plan = ThreadPlan(cpus=per_worker, intra_op=intra_op, inter_op=max(1, TORCH_INTEROP_THREADS),
+                      workers=workers, worker_index=worker_index)
+
+    # pinning needs to know which worker this is, and only helps when workers get disjoint cores
+    if affinity in ("worker", "model") and worker_index is not None and len(cpus) >= workers:
+        start = (worker_index % workers) * per_worker
+        plan.affinity = cpus[start:start + per_worker]
+        if affinity == "model" and len(plan.affinity) >= concurrent_calls:
+            offset = 0
+            for role, share in shares:
+                size = max(1, len(plan.affinity) * share // concurrent_calls)
+                plan.role_affinity[role] = plan.affinity[offset:offset + size]
+                offset += size
+    return plan
+
+
+_applied: ThreadPlan | None = None
+
+
+def _pin_process(cores: list[int]):
+    # sched_setaffinity(0) only pins the calling thread on Linux; pin every thread that already exists
+    for tid in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(tid), cores)
+        except OSError:
+            pass
+
+
+def apply_thread_plan(plan: ThreadPlan | None = None) -> ThreadPlan | None:
+    """
+    Size torch's thread pools (and pin the worker when configured) from
+    `plan`, or from the planned defaults unless INFERENCE_THREAD_PLAN=off.
+    Call once per process before the first model call: the inter-op pool
+    cannot be resized after it has started.
+    """
+    global _applied
+    if plan is None and INFERENCE_THREAD_PLAN == "off":
+        return None
+    import torch
+
+    if plan is None:
+        index = os.getenv("INFERENCE_WORKER_INDEX")
+        plan = plan_threads(worker_index=int(index) if index is not None else None)
+    torch.set_num_threads(plan.intra_op)
+    try:
+        torch.set_num_interop_threads(plan.inter_op)
+    except RuntimeError:
+        logger.warning("inter-op thread pool already started; keeping %d threads", torch.get_num_interop_threads())
+    if plan.affinity:
+        _pin_process(plan.affinity)
+    _applied = plan
+    logger.info("Inference thread plan: %s", plan)
+    return plan
+
+
+def pin_current_thread(role: str):
+    """Thread initializer for a model's threads (INFERENCE_CPU_AFFINITY=model)."""
+    cores = _applied.role_affinity.get(role) if _applied is not None else None
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+
+def onnx_intra_op_threads() -> int | None:
+    # ONNX Runtime sessions keep their own pool; size it like torch's
+    if INFERENCE_THREAD_PLAN == "off":
+        return None
+    return plan_threads().intra_op
+
+
+def thread_plan_stats() -> dict | None:
+    if _applied is None:
+        return None
+    return {
+        "cpus": _applied.cpus,
+        "intra_op": _applied.intra_op,
+        "inter_op": _applied.inter_op,
+        "workers": _applied.workers,
+        "worker_index": _applied.worker_index,
+        "affinity": _applied.affinity,
+    }
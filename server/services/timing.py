@@ -0,0 +1,24 @@
+import time
+
+
+class StageTimer:
+    """
+    Record wall-clock time (ms) of each named pipeline stage.
+
+    Stages may overlap (e.g. run under asyncio.gather); each one is timed
+    from its own start, and `total` is measured from timer creation.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    async def timed(self, name: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def summary(self) -> dict[str, float]:
+        return {**self.timings, "total": round((time.perf_counter() - self._start) * 1000, 2)}
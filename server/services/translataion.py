@@ -1,41 +1,187 @@
 
-from transformers import MarianMTModel, MarianTokenizer, AutoTokenizer, AutoModelForSequenceClassification
+import os
+import time
+import asyncio
+from concurrent.futures import Future
 import torch
-import torch.nn.functional as F
-from functools import lru_cache
+from functools import lru_cache, partial
+from services.batching import MicroBatcher
+from services.decoding import DecodingPolicy
+from services.thread_plan import pin_current_thread
+from services.inference_backend import load_seq2seq
+from services.metrics import traced
+from services.translation_cache import TranslationCache
+from services.sentences import split_sentences, join_sentences
+
+# Micro-batching settings (shared by both directions)
+TRANSLATION_MAX_BATCH_SIZE = int(os.getenv("TRANSLATION_MAX_BATCH_SIZE", "8"))
+TRANSLATION_MAX_WAIT_MS = float(os.getenv("TRANSLATION_MAX_WAIT_MS", "5"))
+
+# LRU cache settings (per direction); set TRANSLATION_CACHE_PATH to persist to SQLite
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "4096"))
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "")
+TRANSLATION_CACHE_DISK_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_DISK_MAX_ENTRIES", "100000"))
+
+# Long messages are split into sentences (max chars per segment) and translated as one batch
+TRANSLATION_MAX_SEGMENT_CHARS = int(os.getenv("TRANSLATION_MAX_SEGMENT_CHARS", "400"))
+
+# Hub names or local checkpoint dirs (e.g. tiny models for offline benchmarks)
+AR_EN_MODEL = os.getenv("AR_EN_MODEL", "Helsinki-NLP/opus-mt-ar-en")
+EN_AR_MODEL = os.getenv("EN_AR_MODEL", "Helsinki-NLP/opus-mt-en-ar")
 
 # Arabic → English
 @lru_cache(maxsize=1)
 def load_ar_to_en():
-    model_name = "Helsinki-NLP/opus-mt-ar-en"
-    tokenizer = MarianTokenizer.from_pretrained(model_name)
-    model = MarianMTModel.from_pretrained(model_name)
-    return tokenizer, model
+    return load_seq2seq(AR_EN_MODEL)
 
 # English → Arabic
 @lru_cache(maxsize=1)
 def load_en_to_ar():
-    model_name = "Helsinki-NLP/opus-mt-en-ar"
-    tokenizer = MarianTokenizer.from_pretrained(model_name)
-    model = MarianMTModel.from_pretrained(model_name)
-    return tokenizer, model
-    
+    return load_seq2seq(EN_AR_MODEL)
+
+
+@traced("translate_batch")
+def _generate_batch(loader, texts: list[str], policy: DecodingPolicy | None = None) -> tuple[list[str], str | None]:
+    """
+    Translate one padded batch; returns the outputs and the decoding mode the
+    policy chose. Without a policy generate() uses the checkpoint's own
+    defaults (beam search up to its max length).
+    """
+    tokenizer, model = loader()
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+    mode, options = None, {}
+    if policy is not None:
+        source_tokens = int(inputs["attention_mask"].sum(dim=1).max())
+        mode, options = policy.choose(source_tokens)
+    started = time.perf_counter()
+    with torch.no_grad():
+        translated = model.generate(**inputs, **options)
+    if policy is not None:
+        policy.observe(mode, source_tokens, time.perf_counter() - started)
+    return tokenizer.batch_decode(translated, skip_special_tokens=True), mode
+
+
+def _translate_batch(loader, texts: list[str], policy: DecodingPolicy | None = None) -> list[str]:
+    return _generate_batch(loader, texts, policy)[0]
+
+
+def _translate_and_cache(loader, policy: DecodingPolicy, cache: TranslationCache, texts: list[str]) -> list[str]:
+    """
+    Batch function for memory-cache misses: the disk tier is read here, in
+    the batcher thread rather than on the event loop, and only the rest is
+    translated. Batches downgraded under load are served but not cached:
+    the cache outlives the load spike.
+    """
+    outputs = [cache.get_disk(text) for text in texts]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        translated, mode = _generate_batch(loader, [texts[i] for i in missing], policy)
+        for i, output in zip(missing, translated):
+            outputs[i] = output
+            if mode != "greedy_under_load":
+                cache.put(texts[i], output)
+    return outputs
+
+
+# One batching scheduler per direction: concurrent callers share a single generate()
+ar_to_en_batcher = MicroBatcher(
+    lambda texts: _translate_and_cache(load_ar_to_en, ar_to_en_policy, ar_to_en_cache, texts),
+    max_batch_size=TRANSLATION_MAX_BATCH_SIZE,
+    max_wait_ms=TRANSLATION_MAX_WAIT_MS,
+    name="translate-ar-en",
+    initializer=partial(pin_current_thread, "translate-ar-en"),
+)
+en_to_ar_batcher = MicroBatcher(
+    lambda texts: _translate_and_cache(load_en_to_ar, en_to_ar_policy, en_to_ar_cache, texts),
+    max_batch_size=TRANSLATION_MAX_BATCH_SIZE,
+    max_wait_ms=TRANSLATION_MAX_WAIT_MS,
+    name="translate-en-ar",
+    initializer=partial(pin_current_thread, "translate-en-ar"),
+)
+
+# Decoding settings per batch (see services/decoding.py); the batcher backlog drives load shedding
+ar_to_en_policy = DecodingPolicy("ar-en", pending=ar_to_en_batcher.pending, max_batch_size=TRANSLATION_MAX_BATCH_SIZE)
+en_to_ar_policy = DecodingPolicy("en-ar", pending=en_to_ar_batcher.pending, max_batch_size=TRANSLATION_MAX_BATCH_SIZE)
+
+
+ar_to_en_cache = TranslationCache(
+    "ar-en", TRANSLATION_CACHE_MAX_ENTRIES, TRANSLATION_CACHE_MAX_BYTES, TRANSLATION_CACHE_PATH,
+    TRANSLATION_CACHE_DISK_MAX_ENTRIES,
+)
+en_to_ar_cache = TranslationCache(
+    "en-ar", TRANSLATION_CACHE_MAX_ENTRIES, TRANSLATION_CACHE_MAX_BYTES, TRANSLATION_CACHE_PATH,
+    TRANSLATION_CACHE_DISK_MAX_ENTRIES,
+)
+
+
+def translation_stats() -> dict:
+    return {
+        "ar_to_en": {**ar_to_en_batcher.stats(), "cache": ar_to_en_cache.stats(), "decoding": ar_to_en_policy.stats()},
+        "en_to_ar": {**en_to_ar_batcher.stats(), "cache": en_to_ar_cache.stats(), "decoding": en_to_ar_policy.stats()},
+    }
 
+
+def _submit_segments(cache: TranslationCache, batcher: MicroBatcher, segments: list[str]) -> list:
+    """
+    Segments in the memory cache resolve immediately; all misses are queued
+    together so the batcher (which also checks the disk cache) pads them
+    into a single generate() call. Safe to call on the event loop.
+    """
+    futures = []
+    for segment in segments:
+        cached = cache.get_memory(segment)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+        else:
+            future = batcher.submit(segment)   # cached by the batcher (see _translate_and_cache)
+        futures.append(future)
+    return futures
+
+
+def _translate_segmented(cache: TranslationCache, batcher: MicroBatcher, text: str) -> str:
+    lines = split_sentences(text, TRANSLATION_MAX_SEGMENT_CHARS)
+    futures = iter(_submit_segments(cache, batcher, [seg for line in lines for seg in line]))
+    return join_sentences([[next(futures).result() for _ in line] for line in lines])
+
+
+async def _atranslate_segmented(cache: TranslationCache, batcher: MicroBatcher, text: str) -> str:
+    lines = split_sentences(text, TRANSLATION_MAX_SEGMENT_CHARS)
+    futures = _submit_segments(cache, batcher, [seg for line in lines for seg in line])
+    results = iter(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+    return join_sentences([[next(results) for _ in line] for line in lines])
+
+
+@traced("translate_ar_to_en")
 def translate_ar_to_en(text: str) -> str:
     try:
-        tokenizer, model = load_ar_to_en()
-        inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        translated = model.generate(**inputs)
-        return tokenizer.decode(translated[0], skip_special_tokens=True)
+        return _translate_segmented(ar_to_en_cache, ar_to_en_batcher, text)
     except Exception as e:
         return f"❌ Error translating AR→EN: {e}"
 
 
+@traced("translate_en_to_ar")
 def translate_en_to_ar(text: str) -> str:
     try:
-        tokenizer, model = load_en_to_ar()
-        inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        translated = model.generate(**inputs)
-        return tokenizer.decode(translated[0], skip_special_tokens=True)
+        return _translate_segmented(en_to_ar_cache, en_to_ar_batcher, text)
+    except Exception as e:
+        return f"❌ Error translating EN→AR: {e}"
+
+
+# --- async variants (await the batcher future without blocking the event loop) ---
+
+@traced("translate_ar_to_en")
+async def atranslate_ar_to_en(text: str) -> str:
+    try:
+        return await _atranslate_segmented(ar_to_en_cache, ar_to_en_batcher, text)
+    except Exception as e:
+        return f"❌ Error translating AR→EN: {e}"
+
+
+@traced("translate_en_to_ar")
+async def atranslate_en_to_ar(text: str) -> str:
+    try:
+        return await _atranslate_segmented(en_to_ar_cache, en_to_ar_batcher, text)
     except Exception as e:
-        return f"❌ Error translating EN→AR: {e}"
\ No newline at end of file
+        return f"❌ Error translating EN→AR: {e}"
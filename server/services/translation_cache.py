@@ -0,0 +1,183 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+# Arabic harakat / tanween / shadda / sukun / superscript alef + tatweel
+_ARABIC_MARKS = re.compile(r"[\u064B-\u0652\u0670\u0640]")
+_WHITESPACE = re.compile(r"\s+")
+
+# rough per-entry bookkeeping overhead (OrderedDict node + tuple + str headers)
+_ENTRY_OVERHEAD = 200
+# trim the SQLite table back to its bound every this many writes
+_DISK_PRUNE_EVERY = 256
+
+
+def normalize_text(text: str) -> str:
+    """
+    Cache key normalization: drop Arabic diacritics and tatweel, collapse whitespace.
+    """
+    text = _ARABIC_MARKS.sub("", text or "")
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _entry_size(key: str, value: str) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+
+
+class TranslationCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate memory use.
+
+    If `path` is given, entries are also written through to a local SQLite
+    file (keeping the newest `max_disk_entries` per namespace), and misses
+    fall back to it, so the cache survives restarts. `get_memory` never
+    touches the file: event-loop callers use it and leave `get_disk` to a
+    worker thread.
+    """
+
+    def __init__(self, namespace: str, max_entries: int = 4096, max_bytes: int = 16 * 1024 * 1024, path: str = "",
+                 max_disk_entries: int = 100_000):
+        self.namespace = namespace
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+
+        self._data: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path = path
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.disk_evictions = 0
+        self._db = None
+        self._db_pid = None
+        self._disk_writes = 0
+        # SQLite I/O has its own lock so memory lookups never wait on a disk read or commit
+        self._disk_lock = threading.Lock()
+
+    # --- public API ---
+
+    def get(self, text: str):
+        value = self.get_memory(text)
+        return value if value is not None else self.get_disk(text)
+
+    def get_memory(self, text: str):
+        """Memory tier only; a miss is counted by the `get_disk` call that follows it."""
+        key = normalize_text(text)
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def get_disk(self, text: str):
+        """Disk tier (blocking); a hit is promoted to memory."""
+        key = normalize_text(text)
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, value)
+            return value
+
+    def put(self, text: str, value: str):
+        key = normalize_text(text)
+        if not key:
+            return
+        with self._lock:
+            self._insert(key, value)
+        self._disk_put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "persistent": bool(self.path),
+            }
+
+    # --- internals (caller holds the lock; disk helpers take _disk_lock) ---
+
+    def _insert(self, key: str, value: str):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= _entry_size(key, old)
+        self._data[key] = value
+        self._bytes += _entry_size(key, value)
+
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            old_key, old_value = self._data.popitem(last=False)
+            self._bytes -= _entry_size(old_key, old_value)
+            self.evictions += 1
+
+    def _conn(self):
+        # opened lazily per process: a SQLite connection must not cross a fork
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db_pid = os.getpid()
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translation_cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str):
+        if not self.path:
+            return None
+        with self._disk_lock:
+            row = self._conn().execute(
+                "SELECT value FROM translation_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _disk_put(self, key: str, value: str):
+        if not self.path:
+            return
+        with self._disk_lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO translation_cache (namespace, key, value) VALUES (?, ?, ?)",
+                (self.namespace, key, value),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % _DISK_PRUNE_EVERY == 0:
+                self._disk_prune(db)
+            db.commit()
+
+    def _disk_prune(self, db):
+        # a (re)written row gets a new rowid, so rowid order is write order: keep the newest
+        cursor = db.execute(
+            "DELETE FROM translation_cache WHERE namespace = ? AND rowid <= ("
+            " SELECT rowid FROM translation_cache WHERE namespace = ?"
+            " ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_disk_entries),
+        )
+        self.disk_evictions += max(0, cursor.rowcount)